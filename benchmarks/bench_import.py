@@ -0,0 +1,54 @@
+"""
+Measure the import time of sanic_openapi with `python -X importtime`.
+
+    PYTHONPATH=. python benchmarks/bench_import.py sanic_openapi.doc sanic_openapi.openapi
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("yaml", "pydantic", "sanic", "ujson", "orjson", "msgpack")
+
+
+def import_time(module):
+    """Return the cumulative import time in microseconds and the imported top level modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        stderr=subprocess.PIPE,
+        check=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        universal_newlines=True,
+    )
+    total = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        imported.add(name.split(".")[0])
+        if name == module:
+            total = int(cumulative)
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["sanic_openapi", "sanic_openapi.doc", "sanic_openapi.openapi"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("| module | median import time (ms) | heavy dependencies imported |")
+    print("|--------|-----------------------:|-----------------------------|")
+    for module in args.modules:
+        times = []
+        for _ in range(args.repeat):
+            total, imported = import_time(module)
+            times.append(total)
+        heavy = ", ".join(sorted(imported.intersection(HEAVY_MODULES))) or "-"
+        print("| {} | {:.1f} | {} |".format(module, statistics.median(times) / 1000, heavy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the JSON backends used to encode the spec.
+
+    PYTHONPATH=. python benchmarks/bench_json_encoders.py --paths 5000
+"""
+import argparse
+import timeit
+from hashlib import blake2b
+
+from sanic_openapi.encoding import JSON_ENCODERS, get_json_encoder
+
+
+def generate_spec(path_count, definition_count):
+    definitions = {
+        "Model{}".format(i): {
+            "type": "object",
+            "required": ["id", "name"],
+            "properties": {
+                "id": {"type": "integer", "format": "int64", "description": "Identifier of model {}".format(i)},
+                "name": {"type": "string", "example": "name {}".format(i)},
+                "tags": {"type": "array", "items": {"type": "string"}},
+            },
+        }
+        for i in range(definition_count)
+    }
+    paths = {}
+    for i in range(path_count):
+        model = "#/definitions/Model{}".format(i % definition_count)
+        paths["/resource{}/{{item_id}}".format(i)] = {
+            method: {
+                "operationId": "{}_resource{}".format(method, i),
+                "summary": "{} resource {}".format(method, i),
+                "consumes": ["application/json"],
+                "produces": ["application/json"],
+                "tags": ["resource{}".format(i % 50)],
+                "parameters": [
+                    {"type": "integer", "format": "int64", "required": True, "in": "path", "name": "item_id"},
+                    {"type": "string", "required": True, "in": "header", "name": "AUTHORIZATION"},
+                ],
+                "responses": {"200": {"schema": {"$ref": model}}},
+            }
+            for method in ("get", "put", "delete")
+        }
+    return {"swagger": "2.0", "info": {"title": "Benchmark", "version": "1.0.0"}, "paths": paths, "definitions": definitions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=5000)
+    parser.add_argument("--definitions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    spec = generate_spec(args.paths, args.definitions)
+
+    print("| encoder | best encode time (ms) | size (bytes) | fingerprint |")
+    print("|---------|----------------------:|-------------:|-------------|")
+    for name in JSON_ENCODERS:
+        try:
+            encoder = get_json_encoder(name)
+        except ImportError:
+            print("| {} | not installed | | |".format(name))
+            continue
+        body = encoder(spec)
+        best = min(timeit.repeat(lambda: encoder(spec), number=1, repeat=args.repeat))
+        print(
+            "| {} | {:.1f} | {} | {} |".format(name, best * 1000, len(body), blake2b(body, digest_size=8).hexdigest())
+        )
+
+
+if __name__ == "__main__":
+    main()
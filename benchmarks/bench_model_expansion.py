@@ -0,0 +1,106 @@
+"""
+Compare serial and parallel expansion of docstring yaml models.
+
+    PYTHONPATH=. python benchmarks/bench_model_expansion.py --models 2000 --workers 8
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from sanic_openapi import doc
+
+MODEL_TEMPLATE = '''
+@dataclass
+class Model{index}:
+    """
+    Model number {index}
+    ---
+    required:
+    - field0
+    properties:
+{properties}
+        part:
+            type: Object
+            ref: Part{part}
+    """
+
+{fields}
+    part: Part{part}
+'''
+
+PART_TEMPLATE = '''
+@dataclass
+class Part{index}:
+    """
+    Part number {index}
+    ---
+    properties:
+        name:
+            type: string
+            description: Name of part {index}
+    """
+
+    name: str
+'''
+
+
+def write_models(directory, model_count, property_count, part_count):
+    """Write a module with the models, process pools need them to be importable."""
+    properties = "\n".join(
+        "        field{0}:\n            type: string\n            description: Field {0}\n            example: value {0}".format(
+            i
+        )
+        for i in range(property_count)
+    )
+    fields = "\n".join("    field{}: str".format(i) for i in range(property_count))
+    source = ["from dataclasses import dataclass\n"]
+    source.extend(PART_TEMPLATE.format(index=i) for i in range(part_count))
+    source.extend(
+        MODEL_TEMPLATE.format(index=i, part=i % part_count, properties=properties, fields=fields)
+        for i in range(model_count)
+    )
+    with open(os.path.join(directory, "bench_models.py"), "w") as fp:
+        fp.write("".join(source))
+
+
+def run(models, executor):
+    doc.definitions.clear()
+    start = time.perf_counter()
+    doc.parse_yaml([doc.ParseClass(model, name=model.__name__) for model in models], executor)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(doc.definitions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=2000)
+    parser.add_argument("--properties", type=int, default=20)
+    parser.add_argument("--parts", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_models(directory, args.models, args.properties, args.parts)
+        sys.path.insert(0, directory)
+        module = importlib.import_module("bench_models")
+        models = [getattr(module, "Model{}".format(i)) for i in range(args.models)]
+
+        # the process pool needs the module in the workers too
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [directory, os.environ.get("PYTHONPATH")]))
+
+        serial, count = run(models, None)
+        print("| mode | workers | time (s) | speedup | definitions |")
+        print("|------|--------:|---------:|--------:|------------:|")
+        print("| serial | 1 | {:.2f} | 1.00 | {} |".format(serial, count))
+        for name, pool in (("thread", ThreadPoolExecutor), ("process", ProcessPoolExecutor)):
+            with pool(max_workers=args.workers) as executor:
+                elapsed, count = run(models, executor)
+            print("| {} | {} | {:.2f} | {:.2f} | {} |".format(name, args.workers, elapsed, serial / elapsed, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Load test the spec endpoints and the Swagger UI assets of an app scaled up
+from examples/cars.
+
+    PYTHONPATH=. python benchmarks/loadtest.py --blueprints 200 --clients 64 --duration 10 --save before.json
+    PYTHONPATH=. python benchmarks/loadtest.py --blueprints 200 --clients 64 --duration 10 --compare before.json
+
+The app runs in a child process on localhost, every target is hit in turn by
+``--clients`` keep-alive connections for ``--duration`` seconds. The worker
+CPU is read from /proc, so it is only reported on Linux.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "examples", "cars")
+
+TARGETS = (
+    "/openapi/spec.json",
+    "/swagger/",
+    "/swagger/swagger-ui.css",
+    "/swagger/swagger-ui-bundle.js",
+)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# --------------------------------------------------------------- #
+# App
+# --------------------------------------------------------------- #
+
+
+def car_blueprint(index):
+    """The blueprint of examples/cars/blueprints/car.py, once per index so every route has its own docs."""
+    from sanic.blueprints import Blueprint
+    from sanic.response import json as json_response
+
+    from sanic_openapi import doc
+
+    from models import Car, Status
+
+    blueprint = Blueprint("Car{}".format(index), "/car{}".format(index))
+
+    @blueprint.get("/", strict_slashes=True)
+    @doc.summary("Fetches all cars")
+    @doc.description("Really gets the job done fetching these cars.  I mean, really, wow.")
+    @doc.produces([Car])
+    def car_list(request):
+        return json_response([])
+
+    @blueprint.get("/<car_id:int>", strict_slashes=True)
+    @doc.summary("Fetches a car")
+    @doc.produces(Car)
+    def car_get(request, car_id):
+        return json_response({})
+
+    @blueprint.put("/<car_id:int>", strict_slashes=True)
+    @doc.summary("Updates a car")
+    @doc.consumes(Car, location="body")
+    @doc.consumes({"AUTHORIZATION": str}, location="header")
+    @doc.produces(Car)
+    def car_put(request, car_id):
+        return json_response({})
+
+    @blueprint.delete("/<car_id:int>", strict_slashes=True)
+    @doc.summary("Deletes a car")
+    @doc.produces(Status)
+    def car_delete(request, car_id):
+        return json_response({"success": True})
+
+    return blueprint
+
+
+def serve(args):
+    sys.path.insert(0, EXAMPLE_DIR)
+    from sanic import Sanic
+
+    from sanic_openapi import openapi_blueprint, swagger_blueprint
+
+    app = Sanic("loadtest")
+    app.blueprint(openapi_blueprint)
+    app.blueprint(swagger_blueprint)
+    for index in range(args.blueprints):
+        app.blueprint(car_blueprint(index))
+    app.config.ACCESS_LOG = False
+    app.config.API_TITLE = "Car API"
+    app.run(host="127.0.0.1", port=args.port, workers=args.workers)
+
+
+def start_server(args):
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--serve",
+        "--port",
+        str(args.port),
+        "--blueprints",
+        str(args.blueprints),
+        "--workers",
+        str(args.workers),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The app exited with {}".format(server.returncode))
+        try:
+            socket.create_connection(("127.0.0.1", args.port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise SystemExit("The app did not start within {}s".format(args.startup_timeout))
+
+
+def cpu_seconds(pid):
+    """User and system CPU of a process and its descendants, None when /proc is not there."""
+    try:
+        with open("/proc/{}/stat".format(pid)) as fp:
+            # the command may contain spaces, the fields follow its closing parenthesis
+            fields = fp.read().rpartition(")")[2].split()
+    except OSError:
+        return None
+    total = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    for child in _children(pid):
+        total += cpu_seconds(child) or 0
+    return total
+
+
+def _children(pid):
+    children = []
+    try:
+        for task in os.listdir("/proc/{}/task".format(pid)):
+            with open("/proc/{}/task/{}/children".format(pid, task)) as fp:
+                children.extend(int(child) for child in fp.read().split())
+    except OSError:
+        pass
+    return children
+
+
+# --------------------------------------------------------------- #
+# Clients
+# --------------------------------------------------------------- #
+
+
+async def read_response(reader):
+    """Status and body size of a HTTP/1.1 response, reading chunked bodies too."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if status in (204, 304):
+        size = 0
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        size = 0
+        while True:
+            chunk_size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(chunk_size + 2)
+            size += chunk_size
+            if not chunk_size:
+                break
+    else:
+        size = int(headers.get("content-length", 0))
+        await reader.readexactly(size)
+    return status, size, headers.get("connection", "").lower() == "close"
+
+
+async def client(port, request, deadline, latencies, stats):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        start = time.perf_counter()
+        try:
+            writer.write(request)
+            status, size, close = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            stats["errors"] += 1
+            writer.close()
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        stats["bytes"] += size
+        if status >= 400:
+            stats["errors"] += 1
+        if close:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def load(port, target, clients, duration, headers):
+    request = "GET {} HTTP/1.1\r\nHost: 127.0.0.1:{}\r\n{}\r\n".format(
+        target, port, "".join("{}: {}\r\n".format(name, value) for name, value in headers)
+    ).encode("latin-1")
+    latencies = []
+    stats = {"errors": 0, "bytes": 0}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(port, request, deadline, latencies, stats) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": stats["errors"],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "bytes_per_request": stats["bytes"] / len(latencies) if latencies else 0,
+        "elapsed": elapsed,
+    }
+
+
+# --------------------------------------------------------------- #
+# Report
+# --------------------------------------------------------------- #
+
+
+COLUMNS = (
+    ("rps", "RPS", "{:.0f}"),
+    ("p50_ms", "p50 (ms)", "{:.2f}"),
+    ("p99_ms", "p99 (ms)", "{:.2f}"),
+    ("cpu_percent", "worker CPU (%)", "{:.0f}"),
+)
+
+
+def _change(value, baseline):
+    if value is None or not baseline:
+        return ""
+    return " ({:+.0f}%)".format((value - baseline) / baseline * 100)
+
+
+def report(results, baseline=None):
+    baseline = baseline or {}
+    lines = [
+        "| target | requests | errors | " + " | ".join(title for _, title, _ in COLUMNS) + " | bytes/req |",
+        "|--------|---------:|-------:|" + "---------:|" * len(COLUMNS) + "----------:|",
+    ]
+    for target, result in results.items():
+        cells = []
+        for key, _, template in COLUMNS:
+            value = result.get(key)
+            cell = "n/a" if value is None else template.format(value)
+            cells.append(cell + _change(value, baseline.get(target, {}).get(key)))
+        lines.append(
+            "| {} | {} | {} | {} | {:.0f} |".format(
+                target, result["requests"], result["errors"], " | ".join(cells), result["bytes_per_request"]
+            )
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blueprints", type=int, default=100, help="copies of the car blueprint")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections per target")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per target")
+    parser.add_argument("--workers", type=int, default=1, help="app worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--target", action="append", help="paths to hit, defaults to the spec and the UI assets")
+    parser.add_argument("--header", action="append", default=[], help="request header, e.g. 'Accept-Encoding: gzip'")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--compare", help="json file of a previous run to compare with")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    headers = [tuple(part.strip() for part in header.split(":", 1)) for header in args.header]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)["results"]
+
+    server = start_server(args)
+    results = {}
+    try:
+        for target in args.target or TARGETS:
+            cpu_before = cpu_seconds(server.pid)
+            result = asyncio.run(load(args.port, target, args.clients, args.duration, headers))
+            cpu_after = cpu_seconds(server.pid)
+            result["cpu_percent"] = (
+                None if cpu_before is None or cpu_after is None else (cpu_after - cpu_before) / result["elapsed"] * 100
+            )
+            results[target] = result
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(
+        "{} blueprints, {} clients, {}s per target, {} workers\n".format(
+            args.blueprints, args.clients, args.duration, args.workers
+        )
+    )
+    print(report(results, baseline))
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump({"args": vars(args), "results": results}, fp, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,30 @@
-from .openapi import blueprint as openapi_blueprint
-from .swagger import blueprint as swagger_blueprint
+import sys
+from importlib import import_module
+from types import ModuleType
 
 __version__ = '0.4.0'
 __all__ = ['openapi_blueprint', 'swagger_blueprint']
+
+# The blueprints pull in sanic and the spec building code, they are only
+# imported on first access so `from sanic_openapi import doc` stays cheap.
+_blueprints = {
+    'openapi_blueprint': '.openapi',
+    'swagger_blueprint': '.swagger',
+}
+
+
+class _LazyModule(ModuleType):
+    # A module level __getattr__ needs Python 3.7, swapping the class of the
+    # module works on the older versions too
+    def __getattr__(self, name):
+        if name in _blueprints:
+            blueprint = import_module(_blueprints[name], __name__).blueprint
+            setattr(self, name, blueprint)
+            return blueprint
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    def __dir__(self):
+        return sorted(list(self.__dict__) + list(_blueprints))
+
+
+sys.modules[__name__].__class__ = _LazyModule
@@ -0,0 +1,318 @@
+"""
+Merge the specs of several services into one document.
+
+    aggregator = SpecAggregator({
+        "cars": "http://cars.internal/openapi/spec.json",
+        "users": {"source": "specs/users.yaml", "prefix": "/users"},
+    })
+    aggregator.register(app, "/openapi/services.json", interval=60)
+
+Each service is fetched again on refresh, a file is compared by content hash
+and an url is requested with the ETag of its last response. Only the services
+that changed are merged again, their paths replace the ones they had and their
+definitions, parameters, responses and security schemes are renamed to
+``<service>.<name>`` when another service already uses the name for something
+else.
+"""
+import asyncio
+import json
+import logging
+import urllib.error
+import urllib.request
+from hashlib import blake2b
+
+from .encoding import get_json_encoder
+
+logger = logging.getLogger(__name__)
+
+# Sections of a spec whose entries are referenced by `$ref`
+SECTIONS = ("definitions", "parameters", "responses")
+
+
+class Upstream:
+    """A service spec and what it brought to the merged spec."""
+
+    def __init__(self, name, source, prefix=""):
+        self.name = name
+        self.source = source
+        self.prefix = prefix
+        self.etag = None
+        self.digest = None
+        self.error = None
+        # merged paths, and the merged names of the entries of each section and security scheme by original name
+        self.paths = []
+        self.names = {section: {} for section in SECTIONS}
+        self.security_definitions = {}
+        self.tags = []
+
+    @property
+    def is_url(self):
+        return self.source.startswith(("http://", "https://"))
+
+    def fetch(self, timeout=10):
+        """The spec when it changed since the last fetch, else None."""
+        if self.is_url:
+            request = urllib.request.Request(self.source, headers={"Accept": "application/json"})
+            if self.etag:
+                request.add_header("If-None-Match", self.etag)
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    body = response.read()
+                    etag = response.headers.get("ETag")
+                    content_type = response.headers.get("Content-Type", "")
+            except urllib.error.HTTPError as error:
+                if error.code == 304:
+                    return None
+                raise
+            self.etag = etag
+        else:
+            with open(self.source, "rb") as fp:
+                body = fp.read()
+            content_type = ""
+
+        digest = blake2b(body, digest_size=16).digest()
+        if digest == self.digest:
+            return None
+        self.digest = digest
+        if "yaml" in content_type or self.source.endswith((".yaml", ".yml")):
+            import yaml
+
+            return yaml.safe_load(body)
+        return json.loads(body)
+
+
+class SpecAggregator:
+    def __init__(self, sources, info=None, json_encoder="auto", timeout=10):
+        self.upstreams = {}
+        for name, source in sources.items():
+            if isinstance(source, str):
+                source = {"source": source}
+            self.upstreams[name] = Upstream(name, source["source"], source.get("prefix", ""))
+        self.info = info or {"title": "API", "version": "1.0.0"}
+        self.timeout = timeout
+        self.dumps = get_json_encoder(json_encoder)
+
+        self.spec = {}
+        self.encoded = b""
+        self.etag = None
+        self._paths = {}
+        # merged entries of each section by name, with the upstreams using them
+        self._entries = {section: {} for section in SECTIONS}
+        self._owners = {section: {} for section in SECTIONS}
+        self._security_definitions = {}
+        self._tags = {}
+        # the upstreams using each security scheme and tag
+        self._security_owners = {}
+        self._tag_owners = {}
+
+    # --------------------------------------------------------------- #
+    # Merging
+    # --------------------------------------------------------------- #
+
+    def refresh(self, names=None):
+        """Fetch the services, merge the ones that changed and encode the spec once. Returns their names."""
+        changed = []
+        for name in names or self.upstreams:
+            upstream = self.upstreams[name]
+            try:
+                spec = upstream.fetch(self.timeout)
+            except Exception as error:
+                # the last spec fetched is kept
+                upstream.error = repr(error)
+                logger.warning("Could not fetch the spec of %s from %s: %r", name, upstream.source, error)
+                continue
+            upstream.error = None
+            if spec is not None:
+                self.merge(name, spec)
+                changed.append(name)
+        if changed or not self.encoded:
+            self._encode()
+        return changed
+
+    def merge(self, name, spec):
+        """Replace what a service brought to the merged spec by the content of ``spec``."""
+        upstream = self.upstreams[name]
+        self._remove(upstream)
+
+        renames = self._renames(upstream, spec)
+        for section in SECTIONS:
+            for entry_name, entry in spec.get(section, {}).items():
+                prefix = "#/{}/".format(section)
+                merged_name = renames.get(prefix + entry_name, prefix + entry_name)[len(prefix):]
+                self._claim(section, entry_name, merged_name, _rewrite_refs(entry, renames), upstream)
+
+        schemes = {}
+        for scheme_name, scheme in spec.get("securityDefinitions", {}).items():
+            merged_name = scheme_name
+            merged = self._security_definitions.get(scheme_name)
+            if merged is not None and _dumps(merged) != _dumps(scheme):
+                merged_name = schemes[scheme_name] = "{}.{}".format(name, scheme_name)
+                logger.warning("Security scheme %s of %s is renamed %s, it differs", scheme_name, name, merged_name)
+            self._security_owners.setdefault(merged_name, []).append(name)
+            self._security_definitions.setdefault(merged_name, scheme)
+            upstream.security_definitions[scheme_name] = merged_name
+
+        prefix = upstream.prefix + spec.get("basePath", "").rstrip("/")
+        for path, path_item in spec.get("paths", {}).items():
+            merged_path = prefix + path
+            if merged_path in self._paths:
+                logger.warning("Path %s of %s is already documented by another service", merged_path, name)
+                continue
+            self._paths[merged_path] = _rewrite_security(_rewrite_refs(path_item, renames), schemes)
+            upstream.paths.append(merged_path)
+
+        for tag in spec.get("tags", ()):
+            tag_name = tag.get("name")
+            if tag_name in self._tags and self._tags[tag_name] != tag:
+                logger.warning("Tag %s of %s differs from another service, the first one is kept", tag_name, name)
+            self._tag_owners.setdefault(tag_name, []).append(name)
+            self._tags.setdefault(tag_name, tag)
+            upstream.tags.append(tag_name)
+
+    def _renames(self, upstream, spec):
+        """
+        The `$ref`s of the entries of a service that are namespaced: the ones
+        whose name is used by another service for something else, once their
+        own references are renamed. Renaming an entry can make the entries
+        referring to it differ too, so it goes on until no rename is added.
+        """
+        renames = {}
+        while True:
+            added = {}
+            for section in SECTIONS:
+                entries = self._entries[section]
+                for entry_name, entry in spec.get(section, {}).items():
+                    ref = "#/{}/{}".format(section, entry_name)
+                    if ref in renames or entry_name not in entries:
+                        continue
+                    if _dumps(entries[entry_name]) != _dumps(_rewrite_refs(entry, renames)):
+                        added[ref] = "#/{}/{}.{}".format(section, upstream.name, entry_name)
+            if not added:
+                return renames
+            renames.update(added)
+
+    def _claim(self, section, entry_name, merged_name, entry, upstream):
+        """Record that a service uses an entry under its merged name, the first one to use a name stores it."""
+        self._owners[section].setdefault(merged_name, []).append(upstream.name)
+        self._entries[section].setdefault(merged_name, entry)
+        upstream.names[section][entry_name] = merged_name
+
+    def _remove(self, upstream):
+        for path in upstream.paths:
+            del self._paths[path]
+        for section in SECTIONS:
+            for merged_name in upstream.names[section].values():
+                _release(self._entries[section], self._owners[section], merged_name, upstream.name)
+            upstream.names[section] = {}
+        for merged_name in upstream.security_definitions.values():
+            _release(self._security_definitions, self._security_owners, merged_name, upstream.name)
+        for tag in upstream.tags:
+            _release(self._tags, self._tag_owners, tag, upstream.name)
+        upstream.paths, upstream.security_definitions, upstream.tags = [], {}, []
+
+    def _encode(self):
+        self.spec = {
+            "swagger": "2.0",
+            "info": self.info,
+            "paths": self._paths,
+            "tags": list(self._tags.values()),
+            "securityDefinitions": self._security_definitions,
+            **{section: self._entries[section] for section in SECTIONS if self._entries[section]},
+        }
+        self.encoded = self.dumps(self.spec)
+        self.etag = '"{}"'.format(blake2b(self.encoded, digest_size=16).hexdigest())
+
+    # --------------------------------------------------------------- #
+    # Serving
+    # --------------------------------------------------------------- #
+
+    def register(self, app, uri="/openapi/aggregate.json", interval=None):
+        """Serve the merged spec at ``uri``, refreshed every ``interval`` seconds while the server runs."""
+        from sanic.response import HTTPResponse, raw
+
+        def aggregated_spec(request):
+            if request.headers.get("If-None-Match") == self.etag:
+                return HTTPResponse(status=304, headers={"ETag": self.etag})
+            return raw(self.encoded, content_type="application/json", headers={"ETag": self.etag})
+
+        app.add_route(aggregated_spec, uri)
+
+        tasks = []
+
+        @app.listener("before_server_start")
+        def fetch_specs(app, loop):
+            self.refresh()
+
+        if interval:
+
+            async def refresh_periodically():
+                loop = asyncio.get_event_loop()
+                while True:
+                    await asyncio.sleep(interval)
+                    # fetching blocks, it is done on the default executor
+                    await loop.run_in_executor(None, self.refresh)
+
+            @app.listener("after_server_start")
+            def start_refreshing(app, loop):
+                tasks.append(loop.create_task(refresh_periodically()))
+
+            @app.listener("before_server_stop")
+            def stop_refreshing(app, loop):
+                while tasks:
+                    tasks.pop().cancel()
+
+    def stats(self):
+        """Source, number of merged paths, ETag and last fetch error of every service."""
+        return {
+            name: {
+                "source": upstream.source,
+                "paths": len(upstream.paths),
+                "etag": upstream.etag,
+                "error": upstream.error,
+            }
+            for name, upstream in self.upstreams.items()
+        }
+
+
+def _release(entries, owners, name, upstream_name):
+    """Forget that an upstream uses an entry, the entry goes with its last user."""
+    owners[name].remove(upstream_name)
+    if not owners[name]:
+        del owners[name]
+        del entries[name]
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _rewrite_refs(value, renames):
+    """Copy of ``value`` with the `$ref`s in ``renames`` renamed, values without any are returned as they are."""
+    if not renames:
+        return value
+    if type(value) is dict:
+        ref = value.get("$ref")
+        rewritten = {key: _rewrite_refs(item, renames) for key, item in value.items()}
+        if type(ref) is str and ref in renames:
+            rewritten["$ref"] = renames[ref]
+        return rewritten
+    if type(value) is list:
+        return [_rewrite_refs(item, renames) for item in value]
+    return value
+
+
+def _rewrite_security(path_item, schemes):
+    """Copy of a path item with the security schemes in ``schemes`` renamed in the requirements of its operations."""
+    if not schemes:
+        return path_item
+    rewritten = dict(path_item)
+    for method, operation in path_item.items():
+        if type(operation) is dict and "security" in operation:
+            rewritten[method] = {
+                **operation,
+                "security": [
+                    {schemes.get(scheme, scheme): scopes for scheme, scopes in requirement.items()}
+                    for requirement in operation["security"]
+                ],
+            }
+    return rewritten
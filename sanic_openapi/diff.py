@@ -0,0 +1,240 @@
+"""
+Compare two generated specs and report the breaking changes.
+
+    python -m sanic_openapi.diff baseline.json spec.json
+
+Paths and definitions are compared by content hash first, only the ones
+that differ are compared in depth.
+"""
+import argparse
+import json
+import sys
+from collections import namedtuple
+from functools import partial
+from hashlib import blake2b
+
+from .encoding import strip_docs
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch")
+
+_dumps = partial(json.dumps, sort_keys=True, separators=(",", ":"), default=str)
+
+# kind is added, removed or changed, subject what changed, e.g. an operation, location where it is in the spec
+Change = namedtuple("Change", ["kind", "subject", "location", "breaking", "detail"])
+
+
+class SpecDiff:
+    def __init__(self, changes):
+        self.changes = changes
+
+    @property
+    def breaking(self):
+        return [change for change in self.changes if change.breaking]
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def format(self, breaking_only=False):
+        lines = []
+        for change in self.breaking if breaking_only else self.changes:
+            line = "{}{} {} {}".format("! " if change.breaking else "  ", change.kind, change.subject, change.location)
+            if change.detail:
+                line += ": " + change.detail
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _hashes(entries):
+    """Content hash and encoded form of every entry of a paths or definitions object."""
+    hashes = {}
+    for name, entry in entries.items():
+        encoded = _dumps(entry)
+        hashes[name] = (blake2b(encoded.encode("utf-8"), digest_size=16).digest(), encoded)
+    return hashes
+
+
+def _changed_names(old_hashes, new_hashes):
+    return [name for name in old_hashes if name in new_hashes and old_hashes[name][0] != new_hashes[name][0]]
+
+
+def _resolve(spec, value):
+    """Follow a `#/parameters/...` or `#/responses/...` reference."""
+    if type(value) is dict and "$ref" in value:
+        _, section, name = value["$ref"].split("/", 2)
+        if section in ("parameters", "responses"):
+            return spec.get(section, {}).get(name, value)
+    return value
+
+
+def _significant(value):
+    return _dumps(strip_docs(value))
+
+
+def diff_specs(old, new):
+    """Return a SpecDiff with the changes from the ``old`` spec to the ``new`` one."""
+    changes = []
+
+    # Shared parameters and responses, operations using a changed one are compared in depth
+    changed_refs = []
+    for section in ("parameters", "responses"):
+        old_shared, new_shared = old.get(section, {}), new.get(section, {})
+        for name in old_shared:
+            if _dumps(old_shared[name]) != _dumps(new_shared.get(name)):
+                changed_refs.append('"#/{}/{}"'.format(section, name))
+
+    old_paths, new_paths = _hashes(old.get("paths", {})), _hashes(new.get("paths", {}))
+    for path in old_paths.keys() - new_paths.keys():
+        for method in _methods(old["paths"][path]):
+            changes.append(Change("removed", "operation", _location(method, path), True, None))
+    for path in new_paths.keys() - old_paths.keys():
+        for method in _methods(new["paths"][path]):
+            changes.append(Change("added", "operation", _location(method, path), False, None))
+
+    to_compare = set(_changed_names(old_paths, new_paths))
+    if changed_refs:
+        for path in old_paths.keys() & new_paths.keys():
+            if any(ref in old_paths[path][1] for ref in changed_refs):
+                to_compare.add(path)
+    for path in sorted(to_compare):
+        changes.extend(_diff_path(old, new, path))
+
+    old_definitions, new_definitions = _hashes(old.get("definitions", {})), _hashes(new.get("definitions", {}))
+    for name in old_definitions.keys() - new_definitions.keys():
+        changes.append(Change("removed", "definition", name, True, None))
+    for name in new_definitions.keys() - old_definitions.keys():
+        changes.append(Change("added", "definition", name, False, None))
+    for name in sorted(_changed_names(old_definitions, new_definitions)):
+        changes.extend(_diff_definition(old["definitions"][name], new["definitions"][name], name))
+
+    changes.sort(key=lambda change: (change.location, change.subject, change.kind))
+    return SpecDiff(changes)
+
+
+def _methods(path_item):
+    return [method for method in path_item if method in HTTP_METHODS]
+
+
+def _location(method, path):
+    return "{} {}".format(method.upper(), path)
+
+
+def _diff_path(old, new, path):
+    old_item, new_item = old["paths"][path], new["paths"][path]
+    for method in _methods(old_item):
+        if method not in new_item:
+            yield Change("removed", "operation", _location(method, path), True, None)
+    for method in _methods(new_item):
+        if method not in old_item:
+            yield Change("added", "operation", _location(method, path), False, None)
+        elif method in old_item:
+            yield from _diff_operation(old, new, old_item[method], new_item[method], _location(method, path))
+
+
+def _parameters(spec, operation):
+    parameters = {}
+    for parameter in operation.get("parameters", ()):
+        parameter = _resolve(spec, parameter)
+        parameters[parameter.get("in"), parameter.get("name")] = parameter
+    return parameters
+
+
+def _diff_operation(old, new, old_operation, new_operation, location):
+    old_parameters, new_parameters = _parameters(old, old_operation), _parameters(new, new_operation)
+    for key, parameter in old_parameters.items():
+        name = "{} {}".format(*key)
+        if key not in new_parameters:
+            yield Change("removed", "parameter", location, True, name)
+            continue
+        new_parameter = new_parameters[key]
+        if _dumps(parameter) == _dumps(new_parameter):
+            continue
+        old_required, new_required = parameter.get("required", False), new_parameter.get("required", False)
+        stripped = ({**parameter, "required": None}, {**new_parameter, "required": None})
+        breaking = (new_required and not old_required) or _significant(stripped[0]) != _significant(stripped[1])
+        yield Change("changed", "parameter", location, breaking, name)
+    for key, parameter in new_parameters.items():
+        if key not in old_parameters:
+            yield Change("added", "parameter", location, bool(parameter.get("required")), "{} {}".format(*key))
+
+    old_responses, new_responses = old_operation.get("responses", {}), new_operation.get("responses", {})
+    for code, response in old_responses.items():
+        if code not in new_responses:
+            yield Change("removed", "response", location, True, str(code))
+            continue
+        response, new_response = _resolve(old, response), _resolve(new, new_responses[code])
+        if _dumps(response) != _dumps(new_response):
+            breaking = _significant(response) != _significant(new_response)
+            yield Change("changed", "response", location, breaking, str(code))
+    for code in new_responses:
+        if code not in old_responses:
+            yield Change("added", "response", location, False, str(code))
+
+    for key in ("consumes", "produces"):
+        removed = set(old_operation.get(key, ())) - set(new_operation.get(key, ()))
+        if removed:
+            yield Change("changed", key, location, True, "no longer " + ", ".join(sorted(removed)))
+
+    for key in ("operationId", "security"):
+        if old_operation.get(key) != new_operation.get(key):
+            yield Change("changed", key, location, True, None)
+    for key in ("summary", "description", "tags"):
+        if old_operation.get(key) != new_operation.get(key):
+            yield Change("changed", key, location, False, None)
+
+
+def _diff_definition(old_definition, new_definition, name):
+    old_properties, new_properties = old_definition.get("properties") or {}, new_definition.get("properties") or {}
+    old_required, new_required = set(old_definition.get("required") or ()), set(new_definition.get("required") or ())
+
+    for prop in old_properties:
+        if prop not in new_properties:
+            yield Change("removed", "property", name, True, prop)
+        elif _dumps(old_properties[prop]) != _dumps(new_properties[prop]):
+            breaking = _significant(old_properties[prop]) != _significant(new_properties[prop])
+            yield Change("changed", "property", name, breaking, prop)
+    for prop in new_properties:
+        if prop not in old_properties:
+            yield Change("added", "property", name, prop in new_required, prop)
+    for prop in sorted(new_required - old_required):
+        if prop in old_properties:
+            yield Change("changed", "property", name, True, prop + " is now required")
+
+    rest = ("properties", "required")
+    old_rest = {key: value for key, value in old_definition.items() if key not in rest}
+    new_rest = {key: value for key, value in new_definition.items() if key not in rest}
+    if _dumps(old_rest) != _dumps(new_rest):
+        yield Change("changed", "definition", name, _significant(old_rest) != _significant(new_rest), None)
+
+
+def load_spec(path):
+    with open(path, "rb") as fp:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            return yaml.safe_load(fp)
+        return json.load(fp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two specs and report the breaking changes.")
+    parser.add_argument("old", help="baseline spec, json or yaml")
+    parser.add_argument("new", help="spec to compare against the baseline")
+    parser.add_argument("--breaking-only", action="store_true", help="only list the breaking changes")
+    args = parser.parse_args(argv)
+
+    spec_diff = diff_specs(load_spec(args.old), load_spec(args.new))
+    output = spec_diff.format(breaking_only=args.breaking_only)
+    if output:
+        print(output)
+    print("{} changes, {} breaking".format(len(spec_diff), len(spec_diff.breaking)))
+    return 1 if spec_diff.breaking else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,13 @@
-import typing
+import json
+import weakref
 from collections import defaultdict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
 from datetime import date, datetime
+from hashlib import blake2b
 from typing import List as ListTyping
 from typing import Union
 
-import yaml
-from pydantic import BaseModel
-
 
 class Field:
     def __init__(self, description=None, required=None, name=None, choices=None, example=None):
@@ -95,10 +96,128 @@ class List(Field):
         return {"type": "array", "items": items}
 
 
-definitions = {}
-# TODO
+class DefinitionRegistry(MutableMapping):
+    """
+    The definitions of the documented models as ``{key: (name, definition)}``,
+    keyed by the model class or, for the models only known from the schema of
+    a pydantic model, by their name.
+
+    Classes are held weakly so models created on the fly are not kept alive
+    by their documentation, and definitions with the same content are stored
+    once. A class entry replaces the name entry with the same name.
+    """
+
+    def __init__(self):
+        # name keys and weak references to classes -> (name, content key)
+        self._entries = {}
+        # content key -> [definition, entries using it, encoded size]
+        self._schemas = {}
+        # live class entries by name
+        self._class_names = defaultdict(int)
+
+    def _key(self, key):
+        return key if isinstance(key, str) else weakref.ref(key)
+
+    def _intern(self, definition):
+        encoded = json.dumps(definition, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        content = blake2b(encoded, digest_size=16).digest()
+        schema = self._schemas.get(content)
+        if schema is None:
+            schema = self._schemas[content] = [definition, 0, len(encoded)]
+        schema[1] += 1
+        return content
+
+    def _forget(self, key, value):
+        name, content = value
+        if not isinstance(key, str):
+            self._class_names[name] -= 1
+            if not self._class_names[name]:
+                del self._class_names[name]
+        schema = self._schemas[content]
+        schema[1] -= 1
+        if not schema[1]:
+            del self._schemas[content]
+
+    def _collected(self, ref):
+        value = self._entries.pop(ref, None)
+        if value is not None:
+            self._forget(ref, value)
+
+    def __getitem__(self, key):
+        name, content = self._entries[self._key(key)]
+        return name, self._schemas[content][0]
+
+    def __setitem__(self, key, value):
+        name, definition = value
+        if not isinstance(name, str):
+            raise TypeError("Definitions are registered with the name of the model, got {!r}".format(name))
+        if isinstance(key, str):
+            if self._class_names.get(name):
+                return
+            entry_key = key
+        else:
+            entry_key = weakref.ref(key, self._collected)
+            if name in self._entries:
+                del self[name]
+        content = self._intern(definition)
+        old = self._entries.get(entry_key)
+        if old is not None:
+            self._forget(entry_key, old)
+        self._entries[entry_key] = (name, content)
+        if not isinstance(key, str):
+            self._class_names[name] += 1
+
+    def __delitem__(self, key):
+        entry_key = self._key(key)
+        self._forget(entry_key, self._entries.pop(entry_key))
+
+    def __iter__(self):
+        for key in list(self._entries):
+            if isinstance(key, str):
+                yield key
+            else:
+                cls = key()
+                if cls is not None:
+                    yield cls
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._schemas.clear()
+        self._class_names.clear()
+
+    def stats(self):
+        """Sizes of the registry, the bytes are the ones of the stored definitions encoded as json."""
+        names = sum(1 for key in self._entries if isinstance(key, str))
+        return {
+            "entries": len(self._entries),
+            "classes": len(self._entries) - names,
+            "names": names,
+            "schemas": len(self._schemas),
+            "schema_bytes": sum(size for _, _, size in self._schemas.values()),
+        }
+
+
+definitions = DefinitionRegistry()
+# Security schemes by name, see `SecurityScheme`
 security_definitions = {}
 
+# Sets collecting the classes serialized while they are on the stack, see `track_models`
+_model_trackers = []
+
+
+@contextmanager
+def track_models():
+    """Collect the classes serialized as objects inside the block."""
+    models = set()
+    _model_trackers.append(models)
+    try:
+        yield models
+    finally:
+        _model_trackers.remove(models)
+
 
 class ParseClass:
     def __init__(self, cls, obj=None, name=None):
@@ -107,320 +226,346 @@ class ParseClass:
         self.name = name
 
 
-def parse_yaml(classes: ListTyping[ParseClass]):
-    # classes = (class, obj, name)
-    for cls in classes:
-        print(cls)
-        if cls.cls not in definitions:
-            if hasattr(cls.cls, "schema"):
-                if "definitions" in cls.cls.schema():
-                    for k, v in cls.cls.schema()["definitions"].items():
-                        definitions[k] = (k, v)
-                    # except:
-                    #     print("No definitions in:", cls.cls.__name__)
-
-                    definitions[cls.cls] = (
-                        cls.cls.__name__,
-                        {
-                            "type": cls.cls.schema()["type"],
-                            "required": cls.cls.schema()["required"] if "required" in cls.cls.schema() else [],
-                            "properties": cls.cls.schema()["properties"],
-                            "description": cls.cls.schema()["description"] if "description" in cls.cls.schema() else "",
-                        },
+def _expand_schema(cls):
+    schema = cls.schema()
+    # models nested in a pydantic model are listed in its own definitions
+    extras = [(k, k, v) for k, v in schema.get("definitions", {}).items()]
+    definition = {
+        "type": schema["type"],
+        "required": schema["required"] if "required" in schema else [],
+        "properties": schema["properties"],
+        "description": schema["description"] if "description" in schema else "",
+    }
+    return definition, extras, []
+
+
+def _expand_docstring(cls):
+    # Only needed once the spec is built, importing the decorators stays cheap
+    import yaml
+
+    to_parse = []
+    definition = {"type": "object", "required": [], "properties": {}}
+
+    full_doc = cls.__doc__
+
+    if not full_doc:
+        return None
+
+    yaml_start = full_doc.find("---")
+    # the libyaml loader is a lot faster when pyyaml was built with it
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    swag = yaml.load(full_doc[yaml_start if yaml_start >= 0 else 0 :], Loader=loader)
+
+    if swag and "required" in swag and swag["required"]:
+        definition["required"] = swag["required"]
+    if swag and "properties" in swag and swag["properties"]:
+        definition["properties"] = swag["properties"]
+
+    if (
+        hasattr(cls, "__dataclass_fields__")
+        and cls.__dataclass_fields__
+        and swag
+        and "properties" in swag
+    ):
+
+        properties_class = set(list(cls.__dataclass_fields__.keys()))
+        properties_swag = set(list(definition["properties"].keys()))
+
+        if properties_swag - properties_class:
+            raise ValueError(
+                f"There are more properties defined in the __doc__ of {cls} then attributes it has: {properties_swag - properties_class}"
+            )
+        if properties_class - properties_swag:
+            raise ValueError(
+                f"There are more properties defined in the attributes of {cls} then in the __doc__ it has: {properties_class - properties_swag}"
+            )
+
+        # check if reference in swag yaml and return them to be parsed next
+        for k, v in swag["properties"].items():
+            # ---------------------------------
+            # class A():
+            #   """
+            #   properties:
+            #       extras:
+            #           items:
+            #               type: string
+            #               description: ...
+            #               example: ...
+            #   """
+            #
+            #   extras: List[ExtraObj]
+            # ---------------------------------
+            # if (
+            #     v["type"] == "array"
+            #     and "items" in v
+            #     and v["items"]["type"] != "Object"
+            # ):
+
+            # ---------------------------------
+            # class A():
+            #   """
+            #   properties:
+            #       extras:
+            #           type: array
+            #           items:
+            #               type: Object
+            #               ref: ExtraObj
+            #   """
+            #
+            #   extras: List[ExtraObj]
+            # ---------------------------------
+            if (
+                "type" in v
+                and v["type"] == "array"
+                and "items" in v
+                and "type" in v["items"]
+                and v["items"]["type"] == "Object"
+            ):
+
+                if len(cls.__dataclass_fields__[k].type.__args__) != 1:
+                    raise Exception(
+                        f"only 1 element in the list is supported! got {cls.__dataclass_fields__[k].type.__args__}"
                     )
-                else:
-                    definitions[cls.cls] = (
-                        cls.cls.__name__,
-                        {
-                            "type": cls.cls.schema()["type"],
-                            "required": cls.cls.schema()["required"] if "required" in cls.cls.schema() else [],
-                            "properties": cls.cls.schema()["properties"],
-                            "description": cls.cls.schema()["description"] if "description" in cls.cls.schema() else "",
-                        },
-                    )
-                # except Exception as e:
-                #     print("\n", e, "\nFor: ", cls.cls.__name__)
-            else:
-                definition = {"type": "object", "required": [], "properties": {}}
-
-                full_doc = cls.cls.__doc__
-
-                if not full_doc:
-                    return False
-
-                yaml_start = full_doc.find("---")
-                swag = yaml.safe_load(full_doc[yaml_start if yaml_start >= 0 else 0 :])
-
-                if swag and "required" in swag and swag["required"]:
-                    definition["required"] = swag["required"]
-                if swag and "properties" in swag and swag["properties"]:
-                    definition["properties"] = swag["properties"]
-
-                if (
-                    hasattr(cls.cls, "__dataclass_fields__")
-                    and cls.cls.__dataclass_fields__
-                    and swag
-                    and "properties" in swag
-                ):
-
-                    properties_class = set(list(cls.cls.__dataclass_fields__.keys()))
-                    properties_swag = set(list(definition["properties"].keys()))
-
-                    if properties_swag - properties_class:
-                        raise ValueError(
-                            f"There are more properties defined in the __doc__ of {cls.cls} then attributes it has: {properties_swag - properties_class}"
-                        )
-                    if properties_class - properties_swag:
-                        raise ValueError(
-                            f"There are more properties defined in the attributes of {cls.cls} then in the __doc__ it has: {properties_class - properties_swag}"
-                        )
-
-                    # check if reference in swag yaml and append them to definitions
-                    # then do a recursive function that parses yaml
-                    to_parse = []
-                    for k, v in swag["properties"].items():
-                        # ---------------------------------
-                        # class A():
-                        #   """
-                        #   properties:
-                        #       extras:
-                        #           items:
-                        #               type: string
-                        #               description: ...
-                        #               example: ...
-                        #   """
-                        #
-                        #   extras: List[ExtraObj]
-                        # ---------------------------------
-                        # if (
-                        #     v["type"] == "array"
-                        #     and "items" in v
-                        #     and v["items"]["type"] != "Object"
-                        # ):
-
-                        # ---------------------------------
-                        # class A():
-                        #   """
-                        #   properties:
-                        #       extras:
-                        #           type: array
-                        #           items:
-                        #               type: Object
-                        #               ref: ExtraObj
-                        #   """
-                        #
-                        #   extras: List[ExtraObj]
-                        # ---------------------------------
-                        if (
-                            "type" in v
-                            and v["type"] == "array"
-                            and "items" in v
-                            and "type" in v["items"]
-                            and v["items"]["type"] == "Object"
-                        ):
-
-                            if len(cls.cls.__dataclass_fields__[k].type.__args__) != 1:
-                                raise Exception(
-                                    f"only 1 element in the list is supported! got {cls.cls.__dataclass_fields__[k].type.__args__}"
-                                )
-                            for class_ in cls.cls.__dataclass_fields__[k].type.__args__:
-                                parse = ParseClass(class_, name=class_.__name__)
-                                to_parse.append(parse)
-                            v["items"]["$ref"] = f"#/definitions/{v['items']['ref']}"
-                            del v["items"]["ref"]
-                        # print(v)
-                        # {'type': 'Union', 'items': [{'home_premium': {'type': 'Object', 'ref': 'HomePremium'}}, {'family_premium': {'type': 'Object', 'ref': 'FamilyPremium'}}, {'car_premium': {'type': 'Object', 'ref': 'CarPremium'}}]}
-                        # ---------------------------------
-                        # class A():
-                        #   """
-                        #   properties:
-                        #       extras:
-                        #           type: Union
-                        #               items:
-                        #               - home_premium:
-                        #                   type: Object
-                        #                   ref: HomePremium
-                        #               - family_premium:
-                        #                   type: Object
-                        #                   ref: FamilyPremium
-                        #               - car_premium:
-                        #                   type: Object
-                        #                   ref: CarPremium
-                        #   """
-                        #
-                        #   extras: Union[]
-                        # ---------------------------------
-                        if (
-                            "type" in v
-                            and v["type"] == "Union"
-                            and "items" in v
-                            # and "type" in v["items"]
-                            # and v["items"]["type"] == "Object"
-                        ):
-                            # v["items"]["$ref"] = [1]
-                            # v["items"]["$ref"] = "SHIT"
-                            # print(v)
-                            # print("golden point")
-                            # v["$ref"] = f"#/definitions/{v['ref']}"
-                            # for item in v["items"]:
-                            v["oneOf"] = []
-
-                            # oneOf:
-                            #   - $ref: '#/components/schemas/foo_schema1'
-                            #   - $ref: '#/components/schemas/foo_schema2'
-                            for item in v["items"]:
-                                # {'home_premium': {'type': 'Object', 'ref': 'HomePremium'}}
-                                for ref, data in item.items():
-                                    # v["items"]["$ref"] = f"#/definitions/{v['items']['ref']}"
-                                    v["oneOf"].append({"$ref": f"#/definitions/{data['ref']}"})
-                                    # del v["items"]["ref"]
-                                    # print(type(item))
-                                    # print(item["ref"])
-                                    for j, w in cls.cls.__dataclass_fields__.items():
-                                        # print(j)
-                                        if j == k:
-                                            for uni in w.type.__args__:
-                                                parse = ParseClass(uni, name=uni.__name__)
-                                                to_parse.append(parse)
-                                                # print(uni.__name__)
-                                                # print(uni)
-                                            # print(w.type)
-                                        # if hasattr(w.type, "__name__") and data["ref"] == w.type.__name__:
-                                        #     print(w)
-                                # parse = ParseClass(w.type, name=w.type.__name__)
-                                # to_parse.append(parse)
-                            del v["items"]
-                            del v["type"]
-
-                        # ---------------------------------
-                        # class A():
-                        #   """
-                        #   properties:
-                        #       signed_at:
-                        #           type: Object
-                        #           ref: Date
-                        #   """
-                        #
-                        #   signed_at: Date
-                        # ---------------------------------
-                        if "ref" in v and "type" in v and v["type"] == "Object":
-                            for j, w in cls.cls.__dataclass_fields__.items():
-                                if hasattr(w.type, "__name__") and v["ref"] == w.type.__name__:
-                                    parse = ParseClass(w.type, name=w.type.__name__)
+                for class_ in cls.__dataclass_fields__[k].type.__args__:
+                    parse = ParseClass(class_, name=class_.__name__)
+                    to_parse.append(parse)
+                v["items"]["$ref"] = f"#/definitions/{v['items']['ref']}"
+                del v["items"]["ref"]
+            # print(v)
+            # {'type': 'Union', 'items': [{'home_premium': {'type': 'Object', 'ref': 'HomePremium'}}, {'family_premium': {'type': 'Object', 'ref': 'FamilyPremium'}}, {'car_premium': {'type': 'Object', 'ref': 'CarPremium'}}]}
+            # ---------------------------------
+            # class A():
+            #   """
+            #   properties:
+            #       extras:
+            #           type: Union
+            #               items:
+            #               - home_premium:
+            #                   type: Object
+            #                   ref: HomePremium
+            #               - family_premium:
+            #                   type: Object
+            #                   ref: FamilyPremium
+            #               - car_premium:
+            #                   type: Object
+            #                   ref: CarPremium
+            #   """
+            #
+            #   extras: Union[]
+            # ---------------------------------
+            if (
+                "type" in v
+                and v["type"] == "Union"
+                and "items" in v
+                # and "type" in v["items"]
+                # and v["items"]["type"] == "Object"
+            ):
+                # v["items"]["$ref"] = [1]
+                # v["items"]["$ref"] = "SHIT"
+                # print(v)
+                # print("golden point")
+                # v["$ref"] = f"#/definitions/{v['ref']}"
+                # for item in v["items"]:
+                v["oneOf"] = []
+
+                # oneOf:
+                #   - $ref: '#/components/schemas/foo_schema1'
+                #   - $ref: '#/components/schemas/foo_schema2'
+                for item in v["items"]:
+                    # {'home_premium': {'type': 'Object', 'ref': 'HomePremium'}}
+                    for ref, data in item.items():
+                        # v["items"]["$ref"] = f"#/definitions/{v['items']['ref']}"
+                        v["oneOf"].append({"$ref": f"#/definitions/{data['ref']}"})
+                        # del v["items"]["ref"]
+                        # print(type(item))
+                        # print(item["ref"])
+                        for j, w in cls.__dataclass_fields__.items():
+                            # print(j)
+                            if j == k:
+                                for uni in w.type.__args__:
+                                    parse = ParseClass(uni, name=uni.__name__)
                                     to_parse.append(parse)
-
-                                elif hasattr(w.type, "__origin__") and w.type.__origin__ == Union:
-
-                                    for i in w.type.__args__:
-
-                                        if hasattr(i, "__origin__") and i.__origin__ == list:
-                                            for l in i.__args__:
-                                                # print("=====================")
-                                                # print(l)
-                                                parse = ParseClass(l, name=l.__name__)
-                                                to_parse.append(parse)
-                                        elif i.__name__ == v["ref"]:
-                                            parse = ParseClass(i, name=i.__name__)
-                                            to_parse.append(parse)
-                            v["$ref"] = f"#/definitions/{v['ref']}"
-                            del v["ref"]
-                    parse_yaml(to_parse)
-
-                if cls.obj:
-                    definitions[cls.cls] = (cls.obj, definition)
-                elif cls.name:
-                    definitions[cls.cls] = (cls.name, definition)
-                else:
-                    raise Exception("no obj nor name defined")
+                                    # print(uni.__name__)
+                                    # print(uni)
+                                # print(w.type)
+                            # if hasattr(w.type, "__name__") and data["ref"] == w.type.__name__:
+                            #     print(w)
+                    # parse = ParseClass(w.type, name=w.type.__name__)
+                    # to_parse.append(parse)
+                del v["items"]
+                del v["type"]
+
+            # ---------------------------------
+            # class A():
+            #   """
+            #   properties:
+            #       signed_at:
+            #           type: Object
+            #           ref: Date
+            #   """
+            #
+            #   signed_at: Date
+            # ---------------------------------
+            if "ref" in v and "type" in v and v["type"] == "Object":
+                for j, w in cls.__dataclass_fields__.items():
+                    if hasattr(w.type, "__name__") and v["ref"] == w.type.__name__:
+                        parse = ParseClass(w.type, name=w.type.__name__)
+                        to_parse.append(parse)
+
+                    elif hasattr(w.type, "__origin__") and w.type.__origin__ == Union:
+
+                        for i in w.type.__args__:
+
+                            if hasattr(i, "__origin__") and i.__origin__ == list:
+                                for l in i.__args__:
+                                    # print("=====================")
+                                    # print(l)
+                                    parse = ParseClass(l, name=l.__name__)
+                                    to_parse.append(parse)
+                            elif i.__name__ == v["ref"]:
+                                parse = ParseClass(i, name=i.__name__)
+                                to_parse.append(parse)
+                v["$ref"] = f"#/definitions/{v['ref']}"
+                del v["ref"]
+
+    return definition, [], to_parse
+
+
+def expand_class(cls):
+    """
+    Expand the definition of a single class without touching `definitions`.
+
+    Returns the definition, the other definitions found on the way as
+    ``(key, name, definition)`` and the classes referenced by the definition
+    that still need to be parsed, or None for a class without a docstring.
+    """
+    if hasattr(cls, "schema"):
+        return _expand_schema(cls)
+    return _expand_docstring(cls)
+
+
+def parse_yaml(classes: ListTyping[ParseClass], executor=None):
+    """
+    Add the definitions of the classes and of the classes they reference to `definitions`.
+
+    Each round of classes is expanded on ``executor`` when one is given, the
+    results are merged in the order of ``classes`` so the outcome is the same
+    as a serial expansion.
+    """
+    pending = list(classes)
+    while pending:
+        todo, seen = [], set()
+        for cls in pending:
+            if cls.cls not in definitions and cls.cls not in seen:
+                seen.add(cls.cls)
+                todo.append(cls)
+
+        if executor is None or len(todo) < 2:
+            results = map(expand_class, [cls.cls for cls in todo])
+        else:
+            results = executor.map(expand_class, [cls.cls for cls in todo], chunksize=max(1, len(todo) // 64))
+
+        pending = []
+        for cls, expanded in zip(todo, results):
+            if expanded is None:
+                continue
+            definition, extras, to_parse = expanded
+            for key, name, extra in extras:
+                definitions[key] = (name, extra)
+            definitions[cls.cls] = (cls.obj.object_name if cls.obj else cls.name or cls.cls.__name__, definition)
+            pending.extend(to_parse)
+
+
+def collect_models(specs):
+    """
+    Classes documented through the fields of route specs that are expanded by
+    `parse_yaml`, pydantic models and dataclasses with a docstring, as
+    `ParseClass`es named like the `Object` documenting them.
+    """
+    models = []
+    seen = set()
+
+    def visit(schema, name=None):
+        if isinstance(schema, RouteField):
+            visit(schema.field)
+        elif isinstance(schema, Object):
+            visit(schema.cls, schema.object_name)
+        elif isinstance(schema, List):
+            for item in schema.items:
+                visit(item)
+        elif isinstance(schema, Dictionary):
+            for item in schema.fields.values():
+                visit(item)
+        elif type(schema) is dict:
+            for item in schema.values():
+                visit(item)
+        elif type(schema) is list:
+            for item in schema:
+                visit(item)
+        elif isinstance(schema, type) and schema not in seen:
+            seen.add(schema)
+            if hasattr(schema, "schema") or (hasattr(schema, "__dataclass_fields__") and schema.__doc__):
+                models.append(ParseClass(schema, name=name or schema.__name__))
+
+    for route_spec in specs:
+        for consumer in route_spec.consumes:
+            visit(consumer)
+        if route_spec.produces:
+            visit(route_spec.produces)
+        for response in route_spec.responses.values():
+            visit(response.get("example"))
+    return models
 
 
 class Object(Field):
     def __init__(self, cls, *args, object_name=None, **kwargs):
         super().__init__(*args, **kwargs)
 
+        # Only keep a reference, the definition is expanded by `register` when the spec is built
         self.cls = cls
         self.object_name = object_name or cls.__name__
 
-        if self.cls not in definitions:
-            definition = self.definition
-
-            if hasattr(self.cls, "__doc__") and self.cls.__doc__:
-                cls = ParseClass(cls=cls, obj=self)
-                parse_yaml([cls])
-            if hasattr(self.cls, "schema") and self.cls.schema():
-                cls = ParseClass(cls=cls, obj=self)
-                parse_yaml([cls])
-            elif "properties" in definition and isinstance(definition["properties"], dict):
-                # remove empty dict
-                definition["properties"] = {k: v for k, v in definition["properties"].items() if v}
-                definitions[self.cls] = (self, definition)
-                # here we yaml parse
-                # @dataclass(config=GlobalConfig)
-                # class A(DataClass):
-                #     """
-                #     some doc
-                #     ---
-                #     required:
-                #     - name
-                #     - a
-                #     properties:
-                #         attr1:
-                #             description: Cat's name
-                #             type: string
-                #             example: Sylvester
-                #     """
-                #
-                #     attr1: str
-                #
-                #     def aa(self):
-                #         pass
-
-                # definition = self.definition
-                # full_doc = self.cls.__doc__
-                #
-                # yaml_start = full_doc.find("---")
-                # swag = yaml.safe_load(full_doc[yaml_start if yaml_start >= 0 else 0 :])
-                # if swag and "required" in swag and swag["required"]:
-                #     definition["required"] = swag["required"]
-                # if swag and "properties" in swag and swag["properties"]:
-                #     definition["properties"] = swag["properties"]
-                #
-                # if (
-                #     hasattr(self.cls, "__dataclass_fields__")
-                #     and self.cls.__dataclass_fields__
-                #     and swag
-                #     and "properties" in swag
-                # ):
-                #
-                #     properties_class = set(list(self.cls.__dataclass_fields__.keys()))
-                #     properties_swag = set(list(definition["properties"].keys()))
-                #
-                #     if properties_swag - properties_class:
-                #         raise ValueError(
-                #             f"There are more properties defined in the __doc__ of {self.cls} then attributes it has: {properties_swag - properties_class}"
-                #         )
-                #     if properties_class - properties_swag:
-                #         raise ValueError(
-                #             f"There are more properties defined in the attributes of {self.cls} then in the __doc__ it has: {properties_class - properties_swag}"
-                #         )
-                #
-                #     print("---" * 100)
-                #
-                #     # check if reference in swag yaml and append them to definitions
-                #     for k, v in swag["properties"].items():
-                #         if "ref" in v:
-                #             # print(v)
-                #             # # print(getattr(self.cls, v["ref"]))
-                #             # print(dir(self.cls))
-                #             # print(self.cls.__validate__)
-                #             # print(self.cls.__dataclass_fields__)
-                #             for j, w in self.cls.__dataclass_fields__.items():
-                #                 # print(dir(w.type))
-                #                 # print(w.type.__name__)
-                #                 if v["ref"] == w.type.__name__:
-                #                     print(w.type.__doc__)
-                #             v["$ref"] = f"#/definitions/{v['ref']}"
-                #             del v["ref"]
+    def register(self):
+        """Add the definition of the class to `definitions` if it is not there yet."""
+        if self.cls in definitions:
+            return
+
+        if hasattr(self.cls, "schema") and self.cls.schema():
+            parse_yaml([ParseClass(cls=self.cls, obj=self)])
+            return
+
+        if self.cls.__doc__:
+            # here we yaml parse
+            # @dataclass(config=GlobalConfig)
+            # class A(DataClass):
+            #     """
+            #     some doc
+            #     ---
+            #     required:
+            #     - name
+            #     - a
+            #     properties:
+            #         attr1:
+            #             description: Cat's name
+            #             type: string
+            #             example: Sylvester
+            #     """
+            #
+            #     attr1: str
+            #
+            #     def aa(self):
+            #         pass
+            parse_yaml([ParseClass(cls=self.cls, obj=self)])
+            # a docstring without yaml properties falls back to the class attributes
+            if self.cls in definitions and definitions[self.cls][1]["properties"]:
+                return
+
+        # placeholder so classes referencing themselves don't recurse forever
+        definitions[self.cls] = (self.object_name, {"type": "object"})
+        definition = self.definition
+        # remove empty dict
+        definition["properties"] = {k: v for k, v in definition["properties"].items() if v}
+        definitions[self.cls] = (self.object_name, definition)
 
     @property
     def definition(self):
@@ -436,6 +581,9 @@ class Object(Field):
         }
 
     def serialize(self):
+        self.register()
+        for models in _model_trackers:
+            models.add(self.cls)
         return {"type": "object", "$ref": "#/definitions/{}".format(self.object_name), **super().serialize()}
 
 
@@ -524,6 +672,52 @@ class RouteField(object):
 route_specs = defaultdict(RouteSpec)
 
 
+class SecurityScheme:
+    """A securityDefinitions entry, registered under its name when created."""
+
+    def __init__(self, name, type, description=None, **kwargs):
+        self.name = name
+        self.type = type
+        self.description = description
+        self.extra = kwargs
+        security_definitions[name] = self
+
+    def serialize(self):
+        output = {"type": self.type, **self.extra}
+        if self.description:
+            output["description"] = self.description
+        return output
+
+
+class ApiKey(SecurityScheme):
+    def __init__(self, name, key, location="header", **kwargs):
+        super().__init__(name, "apiKey", **kwargs)
+        # "name" and "in" are the header or query parameter carrying the key
+        self.extra.update({"name": key, "in": location})
+
+
+class BasicAuth(SecurityScheme):
+    def __init__(self, name, **kwargs):
+        super().__init__(name, "basic", **kwargs)
+
+
+class OAuth2(SecurityScheme):
+    def __init__(self, name, flow, scopes=None, **kwargs):
+        super().__init__(name, "oauth2", flow=flow, scopes=scopes or {}, **kwargs)
+
+
+def security_requirement(arg):
+    """
+    A security requirement object from what `security` was given: a scheme,
+    its name or a ``{name: scopes}`` dict for schemes that all have to be met.
+    """
+    if isinstance(arg, SecurityScheme):
+        return {arg.name: []}
+    if isinstance(arg, str):
+        return {arg: []}
+    return {getattr(name, "name", name): list(scopes) for name, scopes in arg.items()}
+
+
 def exclude(boolean):
     def inner(func):
         route_specs[func].exclude = boolean
@@ -571,6 +765,14 @@ def produces(*args, content_type=None):
     return inner
 
 
+def operation(name):
+    def inner(func):
+        route_specs[func].operation = name
+        return func
+
+    return inner
+
+
 def tag(name):
     def inner(func):
         route_specs[func].tags.append(name)
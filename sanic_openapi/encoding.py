@@ -0,0 +1,232 @@
+import json
+import math
+from datetime import date, time
+from functools import partial
+
+
+def _default(value):
+    """Dates and times in ISO 8601 like orjson writes them, anything else as its str."""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+# Keys are always sorted so every encoder produces the same bytes for the same spec
+_dumps = partial(json.dumps, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+# Top level keys that can get big enough to be worth encoding entry by entry
+STREAMED_KEYS = ("paths", "definitions")
+
+
+def iter_encode(spec, chunk_size=64 * 1024):
+    """
+    Encode a spec to JSON piece by piece.
+
+    Every entry of the streamed keys is encoded on its own, so the whole
+    document never exists as one string. Small pieces are buffered until
+    they reach ``chunk_size`` characters.
+    """
+    buffer = []
+    size = 0
+    for piece in _iter_pieces(spec):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _iter_pieces(spec):
+    yield "{"
+    for index, (key, value) in enumerate(sorted(spec.items())):
+        if index:
+            yield ","
+        yield _dumps(str(key)) + ":"
+        if key in STREAMED_KEYS and type(value) is dict:
+            yield "{"
+            for entry_index, (name, entry) in enumerate(sorted(value.items())):
+                if entry_index:
+                    yield ","
+                yield _dumps(str(name)) + ":" + _dumps(entry)
+            yield "}"
+        else:
+            yield _dumps(value)
+    yield "}"
+
+
+def write_spec(spec, fp, chunk_size=64 * 1024):
+    """Write a spec as JSON to a path or a text file object."""
+    if isinstance(fp, str):
+        with open(fp, "w", encoding="utf-8") as handle:
+            return write_spec(spec, handle, chunk_size)
+    for chunk in iter_encode(spec, chunk_size):
+        fp.write(chunk)
+
+
+# --------------------------------------------------------------- #
+# Alternative encodings
+# --------------------------------------------------------------- #
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "min": "application/json",
+    "yaml": "application/x-yaml",
+    "msgpack": "application/msgpack",
+}
+
+# Media types accepted for content negotiation, mapped to their format
+ACCEPTED_MEDIA_TYPES = {
+    "application/json": "json",
+    "application/x-yaml": "yaml",
+    "application/yaml": "yaml",
+    "text/yaml": "yaml",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+# Keys whose values map user chosen names to objects, these names are never stripped
+_NAME_MAPS = ("properties", "definitions", "paths", "parameters", "responses", "securityDefinitions")
+
+_STRIPPED_KEYS = ("description", "example", "examples")
+
+
+def strip_docs(value, name_map=False):
+    """Return a copy of a spec without descriptions and examples."""
+    if type(value) is dict:
+        return {
+            key: strip_docs(item, not name_map and type(item) is dict and key in _NAME_MAPS)
+            for key, item in value.items()
+            if name_map or key not in _STRIPPED_KEYS
+        }
+    if type(value) is list:
+        return [strip_docs(item) for item in value]
+    return value
+
+
+def encode_minified(spec, dumps=None):
+    return (dumps or _stdlib_dumps)(strip_docs(spec))
+
+
+def encode_yaml(spec):
+    import yaml
+
+    return yaml.safe_dump(spec, default_flow_style=False, sort_keys=True, allow_unicode=True).encode("utf-8")
+
+
+def encode_msgpack(spec):
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("msgpack must be installed to encode the spec as msgpack")
+
+    return msgpack.packb(_sort_keys(spec), use_bin_type=True, default=str)
+
+
+def _sort_keys(value):
+    if type(value) is dict:
+        return {key: _sort_keys(value[key]) for key in sorted(value)}
+    if type(value) is list:
+        return [_sort_keys(item) for item in value]
+    return value
+
+
+# --------------------------------------------------------------- #
+# JSON backends
+# --------------------------------------------------------------- #
+
+
+def _stdlib_dumps(spec):
+    return _dumps(spec).encode("utf-8")
+
+
+def _is_unportable(value):
+    """
+    Whether ``value`` holds what the backends encode differently: floats
+    written with an exponent (``1e-07``, ``1e-7`` or ``0.0000001``), NaN,
+    infinities and keys that are not strings. The other floats get the same
+    shortest repr everywhere.
+    """
+    if type(value) is float:
+        return not math.isfinite(value) or "e" in repr(value)
+    if type(value) is dict:
+        return any(type(key) is not str or _is_unportable(item) for key, item in value.items())
+    if type(value) is list:
+        return any(_is_unportable(item) for item in value)
+    return False
+
+
+def _ujson_dumps(spec):
+    import ujson
+
+    if _is_unportable(spec):
+        return _stdlib_dumps(spec)
+
+    return ujson.dumps(
+        spec, sort_keys=True, ensure_ascii=False, escape_forward_slashes=False, default=_default
+    ).encode("utf-8")
+
+
+def _orjson_dumps(spec):
+    import orjson
+
+    if _is_unportable(spec):
+        return _stdlib_dumps(spec)
+
+    # dates and times go through the default like with the other backends
+    return orjson.dumps(spec, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+JSON_ENCODERS = {"orjson": _orjson_dumps, "ujson": _ujson_dumps, "json": _stdlib_dumps}
+
+
+def get_json_encoder(name="auto"):
+    """
+    Return a function encoding a spec to JSON bytes with sorted keys.
+
+    ``name`` is one of ``orjson``, ``ujson``, ``json`` or ``auto``, which
+    picks the fastest backend that is installed.
+    """
+    if name == "auto":
+        for candidate in ("orjson", "ujson"):
+            try:
+                __import__(candidate)
+            except ImportError:
+                continue
+            return JSON_ENCODERS[candidate]
+        return _stdlib_dumps
+    if name not in JSON_ENCODERS:
+        raise ValueError("Unknown JSON encoder {!r}, expected one of {}".format(name, sorted(JSON_ENCODERS)))
+    if name != "json":
+        __import__(name)
+    return JSON_ENCODERS[name]
+
+
+ENCODERS = {"min": encode_minified, "yaml": encode_yaml, "msgpack": encode_msgpack}
+
+
+def negotiate(accept, available, default="json"):
+    """Pick the format from ``available`` that best matches an Accept header."""
+    if not accept:
+        return default
+    best, best_quality = None, 0.0
+    for media_range in accept.split(","):
+        media_type, *params = media_range.strip().split(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params:
+            name, _, param_value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in ("*/*", "application/*"):
+            fmt = default
+        else:
+            fmt = ACCEPTED_MEDIA_TYPES.get(media_type)
+        if fmt in available and quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
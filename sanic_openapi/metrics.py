@@ -0,0 +1,139 @@
+"""
+Request count, errors and latency histogram of every documented operation.
+
+The counters are arrays allocated when the spec is built, one slot per
+operation, so recording a request only indexes them. The slot of a request is
+looked up by the endpoint the router already matched.
+"""
+from array import array
+from bisect import bisect_right
+from time import perf_counter
+
+# Upper bounds of the latency buckets in seconds, the last bucket has no bound
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _zeros(typecode, size):
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+
+class OperationMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # (operationId, method, path, tags) of each slot
+        self.operations = []
+        # slot of each (endpoint, METHOD)
+        self._index = {}
+        self._allocate(0)
+
+    def _allocate(self, size):
+        self.counts = _zeros("Q", size)
+        self.server_errors = _zeros("Q", size)
+        self.client_errors = _zeros("Q", size)
+        self.durations = _zeros("d", size)
+        self.histogram = _zeros("Q", size * (len(self.buckets) + 1))
+
+    def set_operations(self, operations, buckets=None):
+        """
+        Allocate the counters of ``operations``, an iterable of ``(key,
+        operationId, method, path, tags)`` where key is ``(endpoint, METHOD)``
+        with the endpoint name of the route. The counts of the operations that
+        were already there are kept.
+        """
+        old_index, old_width = self._index, len(self.buckets) + 1
+        old = (self.counts, self.server_errors, self.client_errors, self.durations, self.histogram)
+        if buckets is not None:
+            self.buckets = tuple(buckets)
+        width = len(self.buckets) + 1
+
+        self._index, self.operations = {}, []
+        for key, operation_id, method, path, tags in operations:
+            if key not in self._index:
+                self._index[key] = len(self.operations)
+                self.operations.append((operation_id, method, path, tags))
+        self._allocate(len(self.operations))
+
+        for key, slot in self._index.items():
+            old_slot = old_index.get(key)
+            if old_slot is None:
+                continue
+            counters = (self.counts, self.server_errors, self.client_errors, self.durations)
+            for new_counters, old_counters in zip(counters, old):
+                new_counters[slot] = old_counters[old_slot]
+            if width == old_width:
+                self.histogram[slot * width:(slot + 1) * width] = old[4][old_slot * width:(old_slot + 1) * width]
+
+    # --------------------------------------------------------------- #
+    # Middleware
+    # --------------------------------------------------------------- #
+
+    def install(self, app):
+        if self.on_request in app.request_middleware:
+            return
+        app.register_middleware(self.on_request, "request")
+        app.register_middleware(self.on_response, "response")
+
+    def on_request(self, request):
+        request.ctx.openapi_started = perf_counter()
+
+    def on_response(self, request, response):
+        # the endpoint is only set once the router matched the request
+        slot = self._index.get((request.endpoint, request.method))
+        if slot is None:
+            return
+        started = request.ctx.__dict__.get("openapi_started")
+        if started is None:
+            return
+        elapsed = perf_counter() - started
+        self.counts[slot] += 1
+        self.durations[slot] += elapsed
+        if response.status >= 500:
+            self.server_errors[slot] += 1
+        elif response.status >= 400:
+            self.client_errors[slot] += 1
+        self.histogram[slot * (len(self.buckets) + 1) + bisect_right(self.buckets, elapsed)] += 1
+
+    # --------------------------------------------------------------- #
+    # Reports
+    # --------------------------------------------------------------- #
+
+    def _quantile(self, histogram, count, fraction):
+        """Upper bound of the bucket holding the quantile, None past the last bound."""
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, histogram):
+            seen += bucket_count
+            if seen >= fraction * count:
+                return bound
+        return None
+
+    def stats(self, slot):
+        width = len(self.buckets) + 1
+        count = self.counts[slot]
+        histogram = self.histogram[slot * width:(slot + 1) * width].tolist()
+        return {
+            "count": count,
+            "server_errors": self.server_errors[slot],
+            "client_errors": self.client_errors[slot],
+            "error_rate": self.server_errors[slot] / count if count else 0.0,
+            "mean": self.durations[slot] / count if count else None,
+            "p50": self._quantile(histogram, count, 0.5) if count else None,
+            "p99": self._quantile(histogram, count, 0.99) if count else None,
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], histogram)),
+        }
+
+    def snapshot(self):
+        """Stats of every operation by ``"METHOD path"``, operationIds may be shared."""
+        return {
+            "{} {}".format(method.upper(), path): {
+                "operationId": operation_id,
+                "method": method,
+                "path": path,
+                "tags": tags,
+                **self.stats(slot),
+            }
+            for slot, (operation_id, method, path, tags) in enumerate(self.operations)
+        }
+
+    def slot(self, key):
+        """Counters slot of an ``(endpoint, METHOD)``, None for undocumented operations."""
+        return self._index.get(key)
@@ -1,15 +1,75 @@
+import asyncio
+import logging
 import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from hashlib import blake2b
+from inspect import isawaitable
 from itertools import repeat
+from json import dumps as json_dumps
+from weakref import WeakKeyDictionary
 
 from sanic.blueprints import Blueprint
-from sanic.response import json
+from sanic.exceptions import NotFound, Unauthorized
+from sanic.response import HTTPResponse, json, raw, stream
 from sanic.views import CompositionView
 
-from .doc import Object, RouteSpec, definitions, route_specs, security_definitions, serialize_schema
+from .doc import (
+    Object,
+    RouteSpec,
+    collect_models,
+    definitions,
+    parse_yaml,
+    route_specs,
+    security_definitions,
+    security_requirement,
+    serialize_schema,
+    track_models,
+)
+from .encoding import ENCODERS, MEDIA_TYPES, encode_minified, get_json_encoder, iter_encode, negotiate, write_spec
+from .metrics import OperationMetrics
+from .reload import ModuleWatcher, documented_modules, reload_module
+from .validate import SpecIndex, SpecValidationError, collect_refs, validate_spec
+
+logger = logging.getLogger(__name__)
 
 blueprint = Blueprint("openapi", url_prefix="openapi")
 
 _spec = {}
+# Paths as built, before parameters and responses are shared, with the routes they were built from
+_paths = {}
+_routes = {}
+# Operations of the paths as built, for validating the spec
+_index = SpecIndex()
+# Paths documenting each model class, models created on the fly are not kept alive by it
+_model_paths = WeakKeyDictionary()
+# Encodings of the spec and their ETags, encoded once per build
+_encoded = {}
+_etags = {}
+# Specs configured in API_SPECS with their encodings and ETags
+_named_specs = {}
+# Credential checks of the secured operations by (handler, method), see `check_credentials`
+_security_checks = {}
+# Progress of the last build, see `build_spec` and /openapi/_stats
+_build_stats = {"state": "pending"}
+# Request counts and latencies of the documented operations, see API_METRICS
+metrics = OperationMetrics()
+# Called with the app after every build of the spec, e.g. to render the Swagger UI page
+build_listeners = []
+# Queues of the clients waiting for the spec to be reloaded
+_listeners = set()
+_watch_task = None
+_build_task = None
+
+EXPANSION_POOLS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+# Used when no security scheme is declared
+DEFAULT_SECURITY_DEFINITIONS = {
+    "appTokenHeader": {"type": "apiKey", "name": "WG-API-TOKEN", "in": "header"},
+    "basicAuth": {"type": "basic"},
+}
 
 
 # Removes all null values from a dictionary
@@ -17,8 +77,272 @@ def remove_nulls(dictionary, deep=True):
     return {k: remove_nulls(v, deep) if deep and type(v) is dict else v for k, v in dictionary.items() if v is not None}
 
 
+def _schema_key(schema):
+    """Hashable key of a schema, equal for equal dict and list schemas of the same fields."""
+    if type(schema) is dict:
+        return ("dict", tuple((key, _schema_key(value)) for key, value in schema.items()))
+    if type(schema) is list:
+        return ("list", tuple(_schema_key(value) for value in schema))
+    try:
+        hash(schema)
+    except TypeError:
+        return ("id", id(schema))
+    return schema
+
+
+def _serialize_cached(schema, cache, models=None):
+    """Serialize a schema once per build, ``models`` collects the classes it documents."""
+    key = _schema_key(schema)
+    if key not in cache:
+        with track_models() as used:
+            cache[key] = (serialize_schema(schema), used)
+    spec, used = cache[key]
+    if models is not None:
+        models.update(used)
+    return spec
+
+
+def _consumer_parameters(consumer, cache, models=None):
+    spec = _serialize_cached(consumer.field, cache, models)
+    if "properties" in spec and consumer.location == "body":
+        # there is a single body, the object is its schema
+        route_params = [{"required": consumer.required, "in": "body", "name": "body", "schema": spec}]
+    elif "properties" in spec:
+        route_params = [
+            {**prop_spec, "required": consumer.required, "in": consumer.location, "name": name}
+            for name, prop_spec in spec["properties"].items()
+        ]
+    else:
+        route_params = [
+            {
+                **spec,
+                "required": consumer.required,
+                "in": consumer.location,
+                "name": consumer.field.name if hasattr(consumer.field, "name") else "body",
+            }
+        ]
+
+    for route_param in route_params:
+        if "$ref" in route_param:
+            route_param["schema"] = {"$ref": route_param.pop("$ref")}
+    return route_params
+
+
+def _responses(route_spec, cache, models=None):
+    responses = {}
+    if route_spec is None:
+        return responses
+    # {400: {'description': 'succes', 'example': {'TODO': 'TODO'}}, 200: {'description': 'succes', 'example': <class 'wg_py_models.insurance.PolicyContract'>}}  # noqa: E501
+    # responses: {
+    # 200: {
+    # description: "successful operation",
+    # schema: {
+    # $ref: "#/definitions/User"
+    # }
+    # },
+    for status_code, response in route_spec.responses.items():
+        entry = {}
+        if response.get("description"):
+            entry["description"] = response["description"]
+        if "example" in response and response["example"]:
+            spec = _serialize_cached(response["example"], cache, models)
+            if "$ref" in spec:
+                entry["schema"] = {"$ref": spec["$ref"]}
+            elif not entry:
+                continue
+        responses[str(status_code)] = entry
+    return responses
+
+
+def _is_view(handler):
+    return type(handler) is CompositionView or hasattr(handler, "view_class")
+
+
+def _view_key(handler):
+    """Key of the documentation of a handler, the class for HTTPMethodView handlers."""
+    return getattr(handler, "view_class", handler)
+
+
+def _method_handlers(route):
+    """Methods of a route with the function implementing each of them."""
+    if type(route.handler) is CompositionView:
+        return route.handler.handlers.items()
+    view_class = getattr(route.handler, "view_class", None)
+    if view_class is not None:
+        return [
+            (method, getattr(view_class, method.lower()))
+            for method in route.methods
+            if hasattr(view_class, method.lower())
+        ]
+    return zip(route.methods, repeat(route.handler))
+
+
+def _merge_specs(view_spec, method_spec):
+    """Combine the documentation of a view with the one of a single method, the method wins."""
+    if view_spec is None or method_spec is None:
+        return method_spec or view_spec
+    merged = RouteSpec()
+    for attr in (
+        "consumes_content_type",
+        "produces",
+        "produces_content_type",
+        "summary",
+        "description",
+        "operation",
+        "blueprint",
+        "exclude",
+    ):
+        value = getattr(method_spec, attr)
+        setattr(merged, attr, value if value is not None else getattr(view_spec, attr))
+    merged.tags = method_spec.tags or view_spec.tags
+    merged.consumes = view_spec.consumes + method_spec.consumes
+    merged.responses = {**view_spec.responses, **method_spec.responses}
+    merged.security = method_spec.security or view_spec.security
+    return merged
+
+
+def _fingerprint(value):
+    return json_dumps(value, sort_keys=True, default=str)
+
+
+def _shared_name(base, fingerprint, names):
+    name, suffix = base, 2
+    while name in names and names[name] != fingerprint:
+        name = "{}_{}".format(base, suffix)
+        suffix += 1
+    names[name] = fingerprint
+    return name
+
+
+def _share_definitions(paths):
+    """
+    Move parameters and responses used by more than one operation to the top
+    level `parameters` and `responses` and reference them from the operations.
+    """
+    operations = [endpoint for methods in paths.values() for endpoint in methods.values()]
+
+    # Operations using each parameter & response, the same operation can be routed twice, e.g. with a trailing slash
+    users = defaultdict(set)
+    for endpoint in operations:
+        for parameter in endpoint.get("parameters", ()):
+            users["parameter", _fingerprint(parameter)].add(endpoint.get("operationId"))
+        for response in endpoint.get("responses", {}).values():
+            if response:
+                users["response", _fingerprint(response)].add(endpoint.get("operationId"))
+
+    parameters, responses = {}, {}
+    parameter_names, response_names = {}, {}
+    refs = {}
+    for endpoint in operations:
+        for index, parameter in enumerate(endpoint.get("parameters", ())):
+            key = ("parameter", _fingerprint(parameter))
+            if len(users[key]) < 2:
+                continue
+            if key not in refs:
+                name = _shared_name("{}_{}".format(parameter["in"], parameter["name"]), key[1], parameter_names)
+                parameters[name] = parameter
+                refs[key] = {"$ref": "#/parameters/{}".format(name)}
+            endpoint["parameters"][index] = refs[key]
+
+        for status_code, response in endpoint.get("responses", {}).items():
+            if not response:
+                continue
+            key = ("response", _fingerprint(response))
+            if len(users[key]) < 2:
+                continue
+            if key not in refs:
+                base = response.get("schema", {}).get("$ref", "response").rsplit("/", 1)[-1]
+                name = _shared_name(base, key[1], response_names)
+                responses[name] = response
+                refs[key] = {"$ref": "#/responses/{}".format(name)}
+            endpoint["responses"][status_code] = refs[key]
+
+    return parameters, responses
+
+
+def _expand_models(app, serial=False):
+    """
+    Expand the documented models up front on a pool of workers, or one after
+    the other when ``serial``, the models left are expanded one by one while
+    the operations are serialized.
+    """
+    pool = getattr(app.config, "API_EXPANSION_POOL", None)
+    if not pool:
+        if serial:
+            parse_yaml(collect_models(route_specs.values()))
+        return
+    if pool not in EXPANSION_POOLS:
+        raise ValueError("Unknown expansion pool {!r}, expected one of {}".format(pool, sorted(EXPANSION_POOLS)))
+
+    models = collect_models(route_specs.values())
+    with EXPANSION_POOLS[pool](max_workers=getattr(app.config, "API_EXPANSION_WORKERS", None)) as executor:
+        parse_yaml(models, executor)
+
+
 @blueprint.listener("before_server_start")
 def build_spec(app, loop):
+    if getattr(app.config, "API_ASYNC_BUILD", False):
+        global _build_task
+        _build_stats.update(state="pending", routes=0, routes_done=0, chunks=0, duration=None, error=None)
+        _build_task = loop.create_task(build_spec_async(app))
+    else:
+        started = time.perf_counter()
+        _start_build(app)
+        routes = _documented_routes(app)
+        _build_stats.update(state="building", routes=len(routes), routes_done=0, chunks=1, duration=None, error=None)
+
+        # Serialized schemas of the fields used by several operations
+        schema_cache = {}
+        for uri, route in routes:
+            _add_path(app, uri, route, schema_cache)
+        _build_stats["routes_done"] = len(routes)
+
+        _finish_spec(app)
+        _build_stats.update(state="done", duration=time.perf_counter() - started)
+
+    if getattr(app.config, "API_SECURITY_CHECK", False) and check_credentials not in app.request_middleware:
+        app.register_middleware(check_credentials, "request")
+    if getattr(app.config, "API_METRICS", False):
+        metrics.install(app)
+
+
+async def build_spec_async(app):
+    """
+    Build the spec without blocking the loop: the routes are built in chunks of
+    API_BUILD_CHUNK_SIZE with the loop running in between, the yaml and
+    pydantic models and the rest of the spec are built on the default
+    executor. The spec endpoints answer 503 until it is done.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_event_loop()
+    _build_stats.update(state="building", routes=0, routes_done=0, chunks=0, duration=None, error=None)
+    try:
+        await loop.run_in_executor(None, _start_build, app, True)
+        routes = _documented_routes(app)
+        _build_stats["routes"] = len(routes)
+
+        chunk_size = getattr(app.config, "API_BUILD_CHUNK_SIZE", 50)
+        schema_cache = {}
+        for start in range(0, len(routes), chunk_size):
+            chunk = routes[start:start + chunk_size]
+            for uri, route in chunk:
+                _add_path(app, uri, route, schema_cache)
+            _build_stats["routes_done"] += len(chunk)
+            _build_stats["chunks"] += 1
+            await asyncio.sleep(0)
+
+        await loop.run_in_executor(None, _finish_spec, app)
+    except asyncio.CancelledError:
+        _build_stats["state"] = "cancelled"
+        raise
+    except Exception as error:
+        _build_stats.update(state="failed", error=repr(error))
+        logger.exception("Could not build the spec")
+        raise
+    _build_stats.update(state="done", duration=time.perf_counter() - started)
+
+
+def _start_build(app, serial_models=False):
     _spec["swagger"] = "2.0"
     # _spec["openapi"] = "3.0.0"
     _spec["info"] = {
@@ -35,6 +359,35 @@ def build_spec(app, loop):
     _spec["schemes"] = getattr(app.config, "API_SCHEMES", ["http"])
     _spec["basePath"] = getattr(app.config, "API_BASEPATH", "")
 
+    _tag_blueprints(app)
+
+    # --------------------------------------------------------------- #
+    # Models
+    # --------------------------------------------------------------- #
+
+    _expand_models(app, serial_models)
+
+    # --------------------------------------------------------------- #
+    # Paths
+    # --------------------------------------------------------------- #
+
+    _paths.clear()
+    _routes.clear()
+    _index.clear()
+    _model_paths.clear()
+
+
+def is_internal_uri(uri):
+    """Whether a route uri belongs to the openapi or swagger blueprints or serves static files."""
+    # TODO: add static flag in sanic routes
+    return uri.startswith("/swagger") or uri.startswith("/openapi") or "<file_uri" in uri
+
+
+def _documented_routes(app):
+    return [(uri, route) for uri, route in app.router.routes_all.items() if not is_internal_uri(uri)]
+
+
+def _tag_blueprints(app):
     # --------------------------------------------------------------- #
     # Blueprint Tags
     # --------------------------------------------------------------- #
@@ -42,150 +395,120 @@ def build_spec(app, loop):
     for blueprint in app.blueprints.values():
         if hasattr(blueprint, "routes"):
             for route in blueprint.routes:
-                route_spec = route_specs[route.handler]
+                route_spec = route_specs[_view_key(route.handler)]
                 route_spec.blueprint = blueprint
                 if not route_spec.tags:
                     route_spec.tags.append(blueprint.name)
 
-    paths = {}
-    for uri, route in app.router.routes_all.items():
-        if uri.startswith("/swagger") or uri.startswith("/openapi") or "<file_uri" in uri:
-            # TODO: add static flag in sanic routes
-            continue
 
-        # --------------------------------------------------------------- #
-        # Methods
-        # --------------------------------------------------------------- #
+def _add_path(app, uri, route, schema_cache):
+    models = set()
+    uri_parsed, methods = _build_path(app, uri, route, schema_cache, models)
+    _paths[uri_parsed] = methods
+    _routes[uri_parsed] = (uri, route)
+    _index.set_path(uri_parsed, methods, route.handler)
+    for model in models:
+        _model_paths.setdefault(model, set()).add(uri_parsed)
 
-        # Build list of methods and their handler functions
-        handler_type = type(route.handler)
-        if handler_type is CompositionView:
-            view = route.handler
-            method_handlers = view.handlers.items()
-        else:
-            method_handlers = zip(route.methods, repeat(route.handler))
 
-        methods = {}
-        for _method, _handler in method_handlers:
-            route_spec = route_specs.get(_handler) or RouteSpec()
+def _build_path(app, uri, route, schema_cache, models):
+    """Build the operations of a route, ``models`` collects the classes they document."""
+    default_consumes = getattr(app.config, "API_CONSUMES_CONTENT_TYPES", ["application/vnd.api+json"])
+    default_produces = getattr(app.config, "API_PRODUCES_CONTENT_TYPES", ["application/vnd.api+json"])
 
-            if _method == "OPTIONS" or route_spec.exclude:
-                continue
+    # --------------------------------------------------------------- #
+    # Path
+    # --------------------------------------------------------------- #
 
-            consumes_content_types = route_spec.consumes_content_type or getattr(
-                app.config, "API_CONSUMES_CONTENT_TYPES", ["application/vnd.api+json"]
-            )
-            produces_content_types = route_spec.produces_content_type or getattr(
-                app.config, "API_PRODUCES_CONTENT_TYPES", ["application/vnd.api+json"]
-            )
-
-            # Parameters - Path & Query String
-            route_parameters = []
-            for parameter in route.parameters:
-                route_parameters.append(
-                    {**serialize_schema(parameter.cast), "required": True, "in": "path", "name": parameter.name}
-                )
-
-            for consumer in route_spec.consumes:
-                spec = serialize_schema(consumer.field)
-                if "properties" in spec:
-                    for name, prop_spec in spec["properties"].items():
-                        route_param = {
-                            **prop_spec,
-                            "required": consumer.required,
-                            "in": consumer.location,
-                            "name": name,
-                        }
-                else:
-                    route_param = {
-                        **spec,
-                        "required": consumer.required,
-                        "in": consumer.location,
-                        "name": consumer.field.name if hasattr(consumer.field, "name") else "body",
-                    }
-
-                if "$ref" in route_param:
-                    route_param["schema"] = {"$ref": route_param["$ref"]}
-                    del route_param["$ref"]
-
-                route_parameters.append(route_param)
-
-            # route_spec.security = {}
-            responses = {}
-            # {400: {'description': 'succes', 'example': {'TODO': 'TODO'}}, 200: {'description': 'succes', 'example': <class 'wg_py_models.insurance.PolicyContract'>}}
-            # responses: {
-            # 200: {
-            # description: "successful operation",
-            # schema: {
-            # $ref: "#/definitions/User"
-            # }
-            # },
-            for status_code, response in route_spec.responses.items():
-                if "example" in response and response['example']:
-                    spec = serialize_schema(response["example"])
-                    if "$ref" in spec:
-                        responses[status_code] = {
-                            # "description": response.get("description"),
-                            "schema": {"$ref": spec["$ref"]}
-                        }
-                else:
-                    responses[status_code] = {}
-
-            # if "200" not in route_spec.responses:
-            #     route_spec.responses["200"] = {
-            #         "description": "successful operation",
-            #         "example": None,
-            #         "schema": serialize_schema(route_spec.produces)
-            #         if route_spec.produces
-            #         else None,
-            #     }
-
-            endpoint = remove_nulls(
-                {
-                    "operationId": route_spec.operation or route.name,
-                    "summary": route_spec.summary,
-                    "description": route_spec.description,
-                    "consumes": consumes_content_types,
-                    "produces": produces_content_types,
-                    "tags": route_spec.tags or None,
-                    "parameters": route_parameters,
-                    # "responses": route_spec.responses,
-                    "responses": responses,
-                    "security": route_spec.security,
-                }
-            )
+    # Shared by all methods of the route
+    uri_parsed = uri
+    path_parameters = []
+    for parameter in route.parameters:
+        uri_parsed = re.sub("<" + parameter.name + ".*?>", "{" + parameter.name + "}", uri_parsed)
+        path_parameters.append(
+            {
+                **_serialize_cached(parameter.cast, schema_cache, models),
+                "required": True,
+                "in": "path",
+                "name": parameter.name,
+            }
+        )
+
+    # Documentation of a whole view, compiled once and shared by its methods
+    view_spec = route_specs.get(_view_key(route.handler)) if _is_view(route.handler) else None
+    if view_spec:
+        view_parameters = [
+            route_param
+            for consumer in view_spec.consumes
+            for route_param in _consumer_parameters(consumer, schema_cache, models)
+        ]
+        view_responses = _responses(view_spec, schema_cache, models)
+    else:
+        view_parameters, view_responses = [], {}
+
+    # --------------------------------------------------------------- #
+    # Methods
+    # --------------------------------------------------------------- #
+
+    methods = {}
+    for _method, _handler in _method_handlers(route):
+        method_spec = route_specs.get(_handler)
+        route_spec = _merge_specs(view_spec, method_spec) or RouteSpec()
+
+        if _method == "OPTIONS" or route_spec.exclude:
+            continue
+
+        # Parameters - Path & Query String
+        route_parameters = path_parameters + view_parameters
+        responses = view_responses
+        if method_spec is not None:
+            for consumer in method_spec.consumes:
+                route_parameters.extend(_consumer_parameters(consumer, schema_cache, models))
+            responses = {**view_responses, **_responses(method_spec, schema_cache, models)}
+
+        if route_spec.operation:
+            operation_id = route_spec.operation
+        elif _is_view(route.handler):
+            operation_id = "{}_{}".format(route.name, _method.lower())
+        else:
+            operation_id = route.name
+
+        endpoint = remove_nulls(
+            {
+                "operationId": operation_id,
+                "summary": route_spec.summary,
+                "description": route_spec.description,
+                "consumes": route_spec.consumes_content_type or default_consumes,
+                "produces": route_spec.produces_content_type or default_produces,
+                "tags": route_spec.tags or None,
+                "parameters": route_parameters,
+                # "responses": route_spec.responses,
+                "responses": dict(responses),
+                "security": [security_requirement(arg) for arg in route_spec.security],
+            }
+        )
+
+        methods[_method.lower()] = endpoint
 
-            methods[_method.lower()] = endpoint
+    return uri_parsed, methods
 
-        uri_parsed = uri
-        for parameter in route.parameters:
-            uri_parsed = re.sub("<" + parameter.name + ".*?>", "{" + parameter.name + "}", uri_parsed)
 
-        paths[uri_parsed] = methods
+def _finish_spec(app):
+    """Everything built from the paths and the definitions registered while building them."""
 
     # --------------------------------------------------------------- #
     # Definitions
     # --------------------------------------------------------------- #
 
-    _spec["definitions"] = {}
-    for k, (obj, definition) in definitions.items():
-        if isinstance(obj, str):
-            _spec["definitions"][obj] = definition
-        else:
-            _spec["definitions"][obj.object_name] = definition
-    #     elif isinstance(k, str):
-    #         _spec["definitions"][k] = definition
+    _spec["definitions"] = {name: definition for name, definition in definitions.values()}
 
-    # _spec["definitions"] = {
-    #     obj.object_name: definition for cls, (obj, definition) in definitions.items()
-    # }
-    _spec["securityDefinitions"] = {
-        "appTokenHeader": {"type": "apiKey", "name": "WG-API-TOKEN", "in": "header"},
-        "basicAuth": {"type": "basic"},
-    }
-    # _spec["securityDefinitions"] = {
-    #     obj.object_name: definition for cls, (obj, definition) in security_definitions.items()
-    # }
+    # --------------------------------------------------------------- #
+    # Security
+    # --------------------------------------------------------------- #
+
+    security = {name: scheme.serialize() for name, scheme in security_definitions.items()}
+    security.update(getattr(app.config, "API_SECURITY_DEFINITIONS", {}))
+    _spec["securityDefinitions"] = security or dict(DEFAULT_SECURITY_DEFINITIONS)
 
     # --------------------------------------------------------------- #
     # Tags
@@ -201,9 +524,467 @@ def build_spec(app, loop):
             tags[tag] = True
     _spec["tags"] = [{"name": name} for name in tags.keys()]
 
-    _spec["paths"] = paths
+    # --------------------------------------------------------------- #
+    # Shared parameters & responses
+    # --------------------------------------------------------------- #
+
+    _set_paths(app, _spec, _paths)
+
+    spec_file = getattr(app.config, "API_SPEC_FILE", None)
+    if spec_file:
+        write_spec(_spec, spec_file)
+
+    _validate_spec(app, _index)
+    _encode_spec(app, _spec, _encoded, _etags)
+
+    _compile_security_checks()
+    _build_named_specs(app)
+    metrics.set_operations(_operations(), getattr(app.config, "API_METRICS_BUCKETS", None))
+
+    for listener in build_listeners:
+        listener(app)
+
+
+def _set_paths(app, spec, paths):
+    # --------------------------------------------------------------- #
+    # Shared parameters & responses
+    # --------------------------------------------------------------- #
+
+    spec.pop("parameters", None)
+    spec.pop("responses", None)
+    if getattr(app.config, "API_SHARED_DEFINITIONS", True):
+        # shared on a copy, the built paths are kept as they are for rebuilding parts of them
+        paths = {
+            uri: {
+                method: {
+                    **endpoint,
+                    "parameters": list(endpoint["parameters"]),
+                    "responses": dict(endpoint["responses"]),
+                }
+                for method, endpoint in methods.items()
+            }
+            for uri, methods in paths.items()
+        }
+        shared_parameters, shared_responses = _share_definitions(paths)
+        if shared_parameters:
+            spec["parameters"] = shared_parameters
+        if shared_responses:
+            spec["responses"] = shared_responses
+    else:
+        paths = dict(paths)
+    spec["paths"] = paths
+
+
+# --------------------------------------------------------------- #
+# Named specs
+# --------------------------------------------------------------- #
+
+
+def _route_blueprint(route):
+    route_spec = route_specs.get(_view_key(route.handler))
+    return route_spec.blueprint if route_spec else None
+
+
+def _selects(selector, uri, route):
+    """Whether a route belongs to a named spec, see API_SPECS."""
+    prefix = selector.get("prefix")
+    if prefix and not uri.startswith(prefix):
+        return False
+    blueprint = _route_blueprint(route)
+    if "blueprints" in selector and getattr(blueprint, "name", None) not in selector["blueprints"]:
+        return False
+    if "version" in selector:
+        version = str(selector["version"])
+        versioned_uri = "/v{}".format(version)
+        if not (
+            uri == versioned_uri
+            or uri.startswith(versioned_uri + "/")
+            or str(getattr(blueprint, "version", None)) == version
+        ):
+            return False
+    return True
+
+
+def _referenced_definitions(spec):
+    """Names of the definitions a spec refers to, directly or through other definitions."""
+    refs = defaultdict(set)
+    for section in ("paths", "parameters", "responses"):
+        collect_refs(spec.get(section, {}), refs, section)
+    pending = [ref for ref in refs if ref.startswith("#/definitions/")]
+    names = set()
+    while pending:
+        name = pending.pop()[len("#/definitions/"):]
+        if name in names or name not in _spec["definitions"]:
+            continue
+        names.add(name)
+        nested = defaultdict(set)
+        collect_refs(_spec["definitions"][name], nested, name)
+        pending.extend(ref for ref in nested if ref.startswith("#/definitions/"))
+    return names
+
+
+def _build_named_specs(app):
+    """
+    Build the specs configured in API_SPECS from the paths of the main spec,
+    their definitions are the very same objects as the ones of the main spec.
+    """
+    _named_specs.clear()
+    for name, selector in getattr(app.config, "API_SPECS", {}).items():
+        spec = {
+            key: value
+            for key, value in _spec.items()
+            if key not in ("paths", "definitions", "parameters", "responses", "tags")
+        }
+        spec["info"] = {**_spec["info"], **selector.get("info", {})}
+        base_path = selector.get("basePath")
+        if base_path is not None:
+            spec["basePath"] = base_path
+
+        paths = {}
+        tags = {}
+        for uri_parsed, methods in _paths.items():
+            uri, route = _routes[uri_parsed]
+            if not _selects(selector, uri, route):
+                continue
+            if base_path and uri_parsed.startswith(base_path):
+                uri_parsed = uri_parsed[len(base_path):] or "/"
+            paths[uri_parsed] = methods
+            for endpoint in methods.values():
+                for tag in endpoint.get("tags", ()):
+                    tags[tag] = True
+        spec["tags"] = [{"name": tag} for tag in tags]
+        _set_paths(app, spec, paths)
+        spec["definitions"] = {
+            definition: _spec["definitions"][definition] for definition in sorted(_referenced_definitions(spec))
+        }
+
+        encoded, etags = {}, {}
+        _encode_spec(app, spec, encoded, etags)
+        _named_specs[name] = (spec, encoded, etags)
+
+
+# --------------------------------------------------------------- #
+# Credential checks
+# --------------------------------------------------------------- #
+
+
+def _credential_check(scheme):
+    """Whether a request carries the credentials of a scheme, not whether they are valid."""
+    scheme_type = scheme.get("type")
+    if scheme_type == "apiKey":
+        key = scheme["name"]
+        if scheme.get("in") == "query":
+            return lambda request: key in request.args
+        key = key.lower()
+        return lambda request: key in request.headers
+    prefix = {"basic": "basic ", "oauth2": "bearer "}.get(scheme_type)
+    if prefix is None:
+        return None
+    return lambda request: request.headers.get("authorization", "")[: len(prefix)].lower() == prefix
+
+
+def _compile_security_checks():
+    """One tuple of checks per security requirement of each secured operation, any requirement can be met."""
+    _security_checks.clear()
+    schemes = _spec["securityDefinitions"]
+    for uri_parsed, methods in _paths.items():
+        handler = _routes[uri_parsed][1].handler
+        for method, endpoint in methods.items():
+            if not endpoint.get("security"):
+                continue
+            requirements = []
+            for requirement in endpoint["security"]:
+                checks = tuple(_credential_check(schemes[name]) for name in requirement if name in schemes)
+                if None in checks:
+                    # a requirement which can't be checked lets every request through
+                    break
+                requirements.append(checks)
+            else:
+                _security_checks[handler, method.upper()] = tuple(requirements)
+
+
+async def check_credentials(request):
+    """
+    Request middleware rejecting the requests to secured operations which
+    carry none of the credentials they are documented with.
+    """
+    if not _security_checks:
+        return
+    try:
+        handler = request.app.router.get(request)[0]
+    except NotFound:
+        return
+    requirements = _security_checks.get((handler, request.method))
+    if requirements is None:
+        return
+    for checks in requirements:
+        if all(check(request) for check in checks):
+            return
+    raise Unauthorized("Missing credentials")
+
+
+def _operations():
+    for uri_parsed, methods in _paths.items():
+        route_endpoint = _routes[uri_parsed][1].endpoint
+        for method, endpoint in methods.items():
+            key = (route_endpoint, method.upper())
+            yield key, endpoint.get("operationId"), method, uri_parsed, endpoint.get("tags", [])
+
+
+def _validate_spec(app, index):
+    mode = getattr(app.config, "API_VALIDATE_SPEC", "warn")
+    if not mode:
+        return
+    problems = validate_spec(_spec, index)
+    if problems and mode == "raise":
+        raise SpecValidationError(problems)
+    for problem in problems:
+        logger.warning("Invalid spec: %s", problem)
+
+
+def _encode_spec(app, spec, encoded, etags):
+    json_encoder = get_json_encoder(getattr(app.config, "API_JSON_ENCODER", "auto"))
+    encoders = {**ENCODERS, "min": partial(encode_minified, dumps=json_encoder)}
+
+    encoded.clear()
+    if not getattr(app.config, "API_SPEC_STREAMING", False):
+        encoded["json"] = json_encoder(spec)
+    for fmt in getattr(app.config, "API_SPEC_FORMATS", []):
+        if fmt not in encoders:
+            raise ValueError("Unknown spec format {!r}, expected one of {}".format(fmt, sorted(encoders)))
+        encoded[fmt] = encoders[fmt](spec)
+
+    etags.clear()
+    for fmt, body in encoded.items():
+        etags[fmt] = '"{}"'.format(blake2b(body, digest_size=16).hexdigest())
+
+
+# --------------------------------------------------------------- #
+# Reloading
+# --------------------------------------------------------------- #
+
+
+def _reloading(app):
+    return bool(getattr(app.config, "API_SPEC_RELOAD", False) and getattr(app, "debug", False))
+
+
+@blueprint.listener("after_server_start")
+def start_watching(app, loop):
+    global _watch_task
+    if _reloading(app):
+        _watch_task = loop.create_task(_watch_modules(app))
+
+
+@blueprint.listener("before_server_stop")
+def cancel_build(app, loop):
+    global _build_task
+    if _build_task is not None:
+        _build_task.cancel()
+        _build_task = None
+
+
+@blueprint.listener("before_server_stop")
+def stop_watching(app, loop):
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        _watch_task = None
+
+
+async def _watch_modules(app):
+    watcher = ModuleWatcher(documented_modules())
+    while True:
+        await asyncio.sleep(getattr(app.config, "API_SPEC_RELOAD_INTERVAL", 1))
+        changed = watcher.changed()
+        if not changed:
+            continue
+        try:
+            reload_spec(app, changed)
+        except Exception:
+            logger.exception("Could not reload the spec after %s changed", ", ".join(changed))
+            continue
+        watcher.add(documented_modules())
+        for queue in _listeners:
+            queue.put_nowait(_etags.get("json", ""))
+
+
+def reload_spec(app, modules):
+    """
+    Reload modules and rebuild the definitions and paths documented in them,
+    the rest of the spec is kept as it is.
+    """
+    replaced = {}
+    for name in modules:
+        logger.info("Reloading the spec documented in %s", name)
+        replaced.update(reload_module(name))
+
+    # Other definitions refer to the replaced models by name, they get the same name again
+    for old, new in replaced.items():
+        if old in definitions:
+            name, _ = definitions.pop(old)
+            Object(new, object_name=name).register()
+
+    affected = set()
+    for old in replaced:
+        affected.update(_model_paths.pop(old, ()))
+    for uri_parsed, (uri, route) in _routes.items():
+        if _view_key(route.handler) in replaced or any(handler in replaced for _, handler in _method_handlers(route)):
+            affected.add(uri_parsed)
+
+    _tag_blueprints(app)
+    schema_cache = {}
+    for uri_parsed in affected:
+        uri, route = _routes[uri_parsed]
+        _add_path(app, uri, route, schema_cache)
+    _finish_spec(app)
+
+
+@blueprint.route("/_stats")
+def build_stats(request):
+    """Progress of the spec build and size of the registered definitions."""
+    return json({"build": _build_stats, "definitions": definitions.stats()})
+
+
+@blueprint.route("/_metrics")
+def operation_metrics(request):
+    """Request count, errors and latency histogram of every operation, see API_METRICS."""
+    return json(metrics.snapshot())
+
+
+@blueprint.route("/_metrics/spec.json")
+def metrics_spec(request):
+    """The spec with the metrics of every operation in an `x-metrics` extension."""
+    unavailable = _unavailable(request)
+    if unavailable:
+        return unavailable
+    paths = {}
+    for uri_parsed, methods in _spec["paths"].items():
+        uri, route = _routes.get(uri_parsed, (None, None))
+        paths[uri_parsed] = {}
+        for method, endpoint in methods.items():
+            slot = metrics.slot((route.endpoint, method.upper())) if route else None
+            paths[uri_parsed][method] = endpoint if slot is None else {**endpoint, "x-metrics": metrics.stats(slot)}
+    json_encoder = get_json_encoder(getattr(request.app.config, "API_JSON_ENCODER", "auto"))
+    return raw(json_encoder({**_spec, "paths": paths}), content_type="application/json")
+
+
+@blueprint.route("/_events")
+def spec_events(request):
+    """Server-sent events with the ETag of the spec each time it is reloaded."""
+    if not _reloading(request.app):
+        # tells EventSource clients to stop reconnecting
+        return HTTPResponse(status=204)
+
+    async def events(response):
+        queue = asyncio.Queue()
+        _listeners.add(queue)
+        try:
+            while True:
+                await _write(response, "data: {}\n\n".format(await queue.get()))
+        finally:
+            _listeners.discard(queue)
+
+    return stream(events, content_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+# --------------------------------------------------------------- #
+# Spec
+# --------------------------------------------------------------- #
+
+
+async def _write(response, data):
+    # Older Sanic versions write synchronously, newer ones return a coroutine
+    result = response.write(data)
+    if isawaitable(result):
+        await result
+
+
+def _stream_spec(spec):
+    async def streaming_fn(response):
+        for chunk in iter_encode(spec):
+            await _write(response, chunk)
+
+    return streaming_fn
+
+
+def _unavailable(request):
+    """The response of the spec endpoints while the spec is built asynchronously."""
+    if _build_stats["state"] == "done":
+        return None
+    return HTTPResponse(
+        "The spec could not be built" if _build_stats["state"] == "failed" else "The spec is being built",
+        status=503,
+        headers={"Retry-After": str(getattr(request.app.config, "API_BUILD_RETRY_AFTER", 1))},
+    )
 
 
 @blueprint.route("/spec.json")
 def spec(request):
-    return json(_spec)
+    unavailable = _unavailable(request)
+    if unavailable:
+        return unavailable
+    if getattr(request.app.config, "API_SPEC_STREAMING", False):
+        return stream(_stream_spec(_spec), content_type="application/json")
+    return _encoded_response(request, "json")
+
+
+def _encoded_response(request, fmt, encoded=None, etags=None):
+    unavailable = _unavailable(request)
+    if unavailable:
+        return unavailable
+    encoded = _encoded if encoded is None else encoded
+    etags = _etags if etags is None else etags
+    if fmt not in encoded:
+        raise NotFound("Spec format {} is not enabled".format(fmt))
+    etag = etags[fmt]
+    if request.headers.get("If-None-Match") == etag:
+        return HTTPResponse(status=304, headers={"ETag": etag})
+    return raw(encoded[fmt], content_type=MEDIA_TYPES[fmt], headers={"ETag": etag})
+
+
+@blueprint.route("/spec.yaml")
+def spec_yaml(request):
+    return _encoded_response(request, "yaml")
+
+
+@blueprint.route("/spec.msgpack")
+def spec_msgpack(request):
+    return _encoded_response(request, "msgpack")
+
+
+@blueprint.route("/spec.min.json")
+def spec_minified(request):
+    return _encoded_response(request, "min")
+
+
+@blueprint.route("/spec")
+def spec_negotiated(request):
+    unavailable = _unavailable(request)
+    if unavailable:
+        return unavailable
+    fmt = negotiate(request.headers.get("Accept"), {"json", *_encoded})
+    if fmt is None:
+        response = raw(b"", status=406)
+    elif fmt == "json":
+        response = spec(request)
+    else:
+        response = _encoded_response(request, fmt)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+SPEC_FILES = {"spec.json": "json", "spec.yaml": "yaml", "spec.msgpack": "msgpack", "spec.min.json": "min"}
+
+
+@blueprint.route("/<name>/<filename>")
+def named_spec(request, name, filename):
+    unavailable = _unavailable(request)
+    if unavailable:
+        return unavailable
+    if name not in _named_specs or filename not in SPEC_FILES:
+        raise NotFound("No spec {}/{}".format(name, filename))
+    spec, encoded, etags = _named_specs[name]
+    fmt = SPEC_FILES[filename]
+    if fmt == "json" and getattr(request.app.config, "API_SPEC_STREAMING", False):
+        return stream(_stream_spec(spec), content_type="application/json")
+    return _encoded_response(request, fmt, encoded, etags)
@@ -0,0 +1,113 @@
+"""
+Reload the modules defining documented handlers and models while developing.
+
+The router keeps calling the handlers it was given, only the documentation
+of the reloaded modules is swapped in: the docs of a reloaded handler are
+moved to the original function and models are replaced by their new class.
+"""
+import importlib
+import os
+import sys
+
+from .doc import Dictionary, List, Object, RouteField, RouteSpec, definitions, route_specs
+
+
+def documented_modules():
+    """Names of the modules defining documented handlers, views and models."""
+    objects = list(route_specs)
+    objects.extend(key for key in definitions if isinstance(key, type))
+    names = set()
+    for obj in objects:
+        name = getattr(obj, "__module__", None)
+        if name and name != "__main__" and not name.startswith("sanic_openapi"):
+            names.add(name)
+    return names
+
+
+class ModuleWatcher:
+    """Tells which of a set of modules had their source file modified."""
+
+    def __init__(self, names=()):
+        self.mtimes = {}
+        self.add(names)
+
+    def add(self, names):
+        for name in names:
+            path = getattr(sys.modules.get(name), "__file__", None)
+            if path and name not in self.mtimes:
+                self.mtimes[name] = (path, _mtime(path))
+
+    def changed(self):
+        changed = []
+        for name, (path, mtime) in self.mtimes.items():
+            current = _mtime(path)
+            if current != mtime:
+                self.mtimes[name] = (path, current)
+                changed.append(name)
+        return changed
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def reload_module(name):
+    """
+    Reload a module and move the documentation of its new objects to the old
+    ones. Returns the replaced objects as ``{old: new}``.
+    """
+    module = sys.modules[name]
+    old_namespace = dict(vars(module))
+    importlib.reload(module)
+
+    replaced = {}
+    for attr, old in old_namespace.items():
+        new = getattr(module, attr, None)
+        if new is None or new is old or getattr(old, "__module__", None) != name:
+            continue
+        if isinstance(old, type) and isinstance(new, type):
+            replaced[old] = new
+            # methods of class based views
+            for member_name, member in vars(old).items():
+                new_member = vars(new).get(member_name)
+                if callable(member) and callable(new_member):
+                    replaced[member] = new_member
+        elif callable(old) and callable(new):
+            replaced[old] = new
+
+    for old, new in replaced.items():
+        if old in route_specs:
+            # the router still calls the old handler, so its docs live under the old key
+            route_specs[old] = route_specs.pop(new, None) or RouteSpec()
+
+    for route_spec in list(route_specs.values()):
+        for consumer in route_spec.consumes:
+            consumer.field = _replace(consumer.field, replaced)
+        if route_spec.produces:
+            route_spec.produces.field = _replace(route_spec.produces.field, replaced)
+        for response in route_spec.responses.values():
+            response["example"] = _replace(response.get("example"), replaced)
+
+    return replaced
+
+
+def _replace(schema, replaced):
+    """Swap replaced classes in a schema for their new version."""
+    if isinstance(schema, RouteField):
+        schema.field = _replace(schema.field, replaced)
+    elif isinstance(schema, Object):
+        schema.cls = replaced.get(schema.cls, schema.cls)
+    elif isinstance(schema, List):
+        schema.items = [_replace(item, replaced) for item in schema.items]
+    elif isinstance(schema, Dictionary):
+        schema.fields = _replace(schema.fields, replaced)
+    elif type(schema) is dict:
+        return {key: _replace(value, replaced) for key, value in schema.items()}
+    elif type(schema) is list:
+        return [_replace(item, replaced) for item in schema]
+    elif isinstance(schema, type):
+        return replaced.get(schema, schema)
+    return schema
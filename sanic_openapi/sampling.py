@@ -0,0 +1,325 @@
+"""
+Infer the parameters and bodies of undocumented routes from the traffic.
+
+    sampler = TrafficSampler(rate=0.01)
+    sampler.install(app)
+    ...
+    sampler.overlay()  # {"paths": {...}} with what was seen on the undocumented operations
+
+A fraction of the requests to routes without any `doc` decorator is looked
+at: the query parameters, the headers and the JSON bodies of the requests and
+of the responses are merged into schemas as they come. Unsampled requests
+only cost a call to `random`.
+"""
+import json
+import re
+from random import random
+
+from .doc import Boolean, Dictionary, Float, Integer, List, RouteField, RouteSpec, String, route_specs
+
+# Headers every client sends, they are not worth documenting
+COMMON_HEADERS = frozenset(
+    (
+        "accept",
+        "accept-encoding",
+        "accept-language",
+        "cache-control",
+        "connection",
+        "content-length",
+        "content-type",
+        "cookie",
+        "host",
+        "if-none-match",
+        "origin",
+        "pragma",
+        "referer",
+        "user-agent",
+    )
+)
+
+_PARAMETER = re.compile(r"<([^:>]+)[^>]*>")
+_FIELDS = {"string": String, "integer": Integer, "number": Float, "boolean": Boolean}
+
+
+class NodeBudget:
+    """How many more schemas the values of an operation may create."""
+
+    __slots__ = ("left",)
+
+    def __init__(self, nodes):
+        self.left = nodes
+
+    def take(self):
+        if self.left <= 0:
+            return False
+        self.left -= 1
+        return True
+
+
+class InferredSchema:
+    """
+    The schema of the values observed so far, bounded in depth, in number of
+    properties and in number of schemas by the budget it shares with the other
+    schemas of its operation.
+    """
+
+    __slots__ = ("count", "objects", "types", "properties", "items", "max_properties", "budget")
+
+    MAX_DEPTH = 8
+    MAX_ITEMS = 16
+
+    def __init__(self, max_properties=64, budget=None):
+        self.count = 0
+        self.objects = 0
+        self.types = {}
+        self.properties = {}
+        self.items = None
+        self.max_properties = max_properties
+        self.budget = budget if budget is not None else NodeBudget(float("inf"))
+
+    def observe(self, value, depth=0):
+        self.count += 1
+        value_type = _json_type(value)
+        self.types[value_type] = self.types.get(value_type, 0) + 1
+        if depth >= self.MAX_DEPTH:
+            return
+        if value_type == "object":
+            self.objects += 1
+            for key, item in value.items():
+                schema = self.properties.get(key)
+                if schema is None:
+                    if len(self.properties) >= self.max_properties or not self.budget.take():
+                        continue
+                    schema = self.properties[key] = InferredSchema(self.max_properties, self.budget)
+                schema.observe(item, depth + 1)
+        elif value_type == "array":
+            if self.items is None:
+                if not self.budget.take():
+                    return
+                self.items = InferredSchema(self.max_properties, self.budget)
+            for item in value[:self.MAX_ITEMS]:
+                self.items.observe(item, depth + 1)
+
+    @property
+    def type(self):
+        types = {value_type: count for value_type, count in self.types.items() if value_type != "null"}
+        if "integer" in types and "number" in types:
+            types["number"] += types.pop("integer")
+        return max(types, key=types.get) if types else None
+
+    def required(self):
+        return sorted(key for key, schema in self.properties.items() if schema.count == self.objects)
+
+    def to_spec(self):
+        spec = {}
+        if self.type:
+            spec["type"] = self.type
+        if "null" in self.types:
+            spec["x-nullable"] = True
+        if self.type == "object":
+            spec["properties"] = {key: schema.to_spec() for key, schema in self.properties.items()}
+            required = self.required()
+            if required:
+                spec["required"] = required
+        elif self.type == "array" and self.items is not None:
+            spec["items"] = self.items.to_spec()
+        return spec
+
+    def to_field(self, **kwargs):
+        """The `doc` field documenting the values, for `RouteSpec`s."""
+        if self.type == "object":
+            return Dictionary({key: schema.to_field() for key, schema in self.properties.items()}, **kwargs)
+        if self.type == "array":
+            return List(self.items.to_field() if self.items is not None else None, **kwargs)
+        return _FIELDS.get(self.type, String)(**kwargs)
+
+
+def _json_type(value):
+    if value is None:
+        return "null"
+    if value is True or value is False:
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return "string"
+
+
+def _scalar(value):
+    """Query and header values are strings, guess what they stand for."""
+    if value in ("true", "false"):
+        return value == "true"
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class RouteSample:
+    """What was observed on an operation."""
+
+    def __init__(self, handler, uri, method, max_properties, max_nodes=1024):
+        self.handler = handler
+        self.uri = uri
+        self.method = method
+        self.count = 0
+        self.max_properties = max_properties
+        # shared by all the schemas of the operation
+        self.budget = NodeBudget(max_nodes)
+        self.query = InferredSchema(max_properties, self.budget)
+        self.headers = InferredSchema(max_properties, self.budget)
+        self.body = None
+        self.responses = {}
+
+    def schema(self):
+        """A new schema of the operation, None once the budget is spent."""
+        if not self.budget.take():
+            return None
+        return InferredSchema(self.max_properties, self.budget)
+
+    def parameters(self):
+        parameters = []
+        for location, schema in (("query", self.query), ("header", self.headers)):
+            required = set(schema.required())
+            for name, value_schema in schema.properties.items():
+                parameters.append(
+                    {**value_schema.to_spec(), "in": location, "name": name, "required": name in required}
+                )
+        if self.body is not None:
+            parameters.append({"in": "body", "name": "body", "required": True, "schema": self.body.to_spec()})
+        return parameters
+
+
+class TrafficSampler:
+    def __init__(self, rate=0.01, max_routes=1000, max_properties=64, max_body_size=64 * 1024, max_nodes=1024):
+        self.rate = rate
+        self.max_routes = max_routes
+        self.max_properties = max_properties
+        self.max_nodes = max_nodes
+        self.max_body_size = max_body_size
+        # samples by (handler, method)
+        self.samples = {}
+        # whether the handlers are documented or left out of the spec, looked up once per handler
+        self._documented = {}
+
+    def install(self, app):
+        app.register_middleware(self.on_request, "request")
+        app.register_middleware(self.on_response, "response")
+
+    # --------------------------------------------------------------- #
+    # Middleware
+    # --------------------------------------------------------------- #
+
+    def on_request(self, request):
+        if random() >= self.rate:
+            return
+        try:
+            handler, _, _, uri = request.app.router.get(request)[:4]
+        except Exception:
+            return
+        if self._is_documented(handler, uri):
+            return
+
+        key = (handler, request.method)
+        sample = self.samples.get(key)
+        if sample is None:
+            if len(self.samples) >= self.max_routes:
+                return
+            sample = self.samples[key] = RouteSample(handler, uri, request.method, self.max_properties, self.max_nodes)
+        sample.count += 1
+        sample.query.observe({name: _scalar(values[0]) for name, values in request.args.items()})
+        headers = {name.lower(): value for name, value in request.headers.items()}
+        sample.headers.observe({name: _scalar(value) for name, value in headers.items() if name not in COMMON_HEADERS})
+        body = self._json(request.headers.get("content-type", ""), request.body)
+        if body is not None:
+            if sample.body is None:
+                sample.body = sample.schema()
+            if sample.body is not None:
+                sample.body.observe(body)
+        request.ctx.openapi_sample = sample
+
+    def on_response(self, request, response):
+        sample = request.ctx.__dict__.get("openapi_sample")
+        if sample is None:
+            return
+        status = str(response.status)
+        body = self._json(response.content_type or "", getattr(response, "body", None))
+        schema = sample.responses.get(status)
+        if schema is None:
+            schema = sample.schema()
+            if schema is None:
+                return
+            sample.responses[status] = schema
+        if body is not None:
+            schema.observe(body)
+
+    def _is_documented(self, handler, uri):
+        documented = self._documented.get(handler)
+        if documented is None:
+            from .openapi import is_internal_uri
+
+            # views are documented on the view class, the spec and UI routes are left out like in the spec
+            route_spec = route_specs.get(getattr(handler, "view_class", handler))
+            documented = self._documented[handler] = is_internal_uri(uri) or bool(
+                route_spec and (route_spec.consumes or route_spec.produces or route_spec.responses)
+            )
+        return documented
+
+    def _json(self, content_type, body):
+        if not body or "json" not in content_type or len(body) > self.max_body_size:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    # --------------------------------------------------------------- #
+    # Exports
+    # --------------------------------------------------------------- #
+
+    def overlay(self):
+        """The inferred operations as a spec fragment, ``{"paths": {path: {method: operation}}}``."""
+        paths = {}
+        for sample in self.samples.values():
+            responses = {
+                status: {"description": "", "schema": schema.to_spec()} if schema.count else {"description": ""}
+                for status, schema in sorted(sample.responses.items())
+            }
+            paths.setdefault(_PARAMETER.sub(r"{\1}", sample.uri), {})[sample.method.lower()] = {
+                "parameters": sample.parameters(),
+                "responses": responses,
+                "x-samples": sample.count,
+            }
+        return {"paths": paths}
+
+    def route_specs(self):
+        """Suggested `RouteSpec`s of the sampled operations by ``(handler, method)``."""
+        suggestions = {}
+        for key, sample in self.samples.items():
+            route_spec = RouteSpec()
+            for location, schema in (("query", sample.query), ("header", sample.headers)):
+                required = set(schema.required())
+                for name, value_schema in schema.properties.items():
+                    route_spec.consumes.append(
+                        RouteField(value_schema.to_field(name=name), location=location, required=name in required)
+                    )
+            if sample.body is not None:
+                route_spec.consumes.append(RouteField(sample.body.to_field(), location="body", required=True))
+            for status, schema in sorted(sample.responses.items()):
+                route_spec.responses[int(status)] = {
+                    "description": "Sampled response",
+                    "example": schema.to_field() if schema.count else None,
+                }
+            suggestions[key] = route_spec
+        return suggestions
@@ -1,11 +1,88 @@
+import gzip
 import os
+from hashlib import blake2b
+from json import dumps as json_dumps
 
 from sanic.blueprints import Blueprint
+from sanic.response import HTTPResponse, raw
+
+from . import openapi
+from .encoding import get_json_encoder
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 dir_path = os.path.abspath(dir_path + '/ui')
 
 blueprint = Blueprint('swagger', url_prefix='swagger')
 
-blueprint.static('/', dir_path + '/index.html')
+# Fetched by the page as soon as the headers arrive instead of once the html is parsed
+PRELOAD = (
+    ('swagger-ui-bundle.js', 'script'),
+    ('swagger-ui-standalone-preset.js', 'script'),
+    ('swagger-ui.css', 'style'),
+    ('fonts.css', 'style'),
+)
+PRELOAD_LINKS = ', '.join('</swagger/{}>; rel=preload; as={}'.format(name, kind) for name, kind in PRELOAD)
+
+with open(dir_path + '/index.html', 'rb') as fp:
+    _template = fp.read()
+
+# The page rendered after every build of the spec, its gzip encoding and ETag
+_page = {}
+
+
+def render_page(app):
+    """Render index.html with the spec inlined, see API_UI_INLINE_SPEC."""
+    body = _template
+    if openapi._reloading(app):
+        # wherever the openapi blueprint is mounted
+        events_url = app.url_for('openapi.spec_events')
+        body = body.replace(b'/*events*/null', json_dumps(events_url).encode('utf-8'))
+
+    inline = getattr(app.config, 'API_UI_INLINE_SPEC', True)
+    if inline and openapi._spec:
+        if inline is True:
+            spec, encoded = openapi._spec, openapi._encoded
+        else:
+            if inline not in openapi._named_specs:
+                raise ValueError(
+                    'API_UI_INLINE_SPEC is {!r}, expected True, False or one of the API_SPECS: {}'.format(
+                        inline, sorted(openapi._named_specs)
+                    )
+                )
+            spec, encoded, _ = openapi._named_specs[inline]
+            body = body.replace(b"'/openapi/spec.json'", "'/openapi/{}/spec.json'".format(inline).encode('utf-8'))
+        json_spec = encoded.get('json') or get_json_encoder(getattr(app.config, 'API_JSON_ENCODER', 'auto'))(spec)
+        # the spec must not close the script element
+        body = body.replace(b'/*spec*/null', json_spec.replace(b'</', b'<\\/'))
+
+    _page['body'] = body
+    _page['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+    _page['etag'] = '"{}"'.format(blake2b(body, digest_size=16).hexdigest())
+
+
+openapi.build_listeners.append(render_page)
+
+
+def _accepts_gzip(request):
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip() == 'gzip' and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            return True
+    return False
+
+
+@blueprint.route('/')
+def index(request):
+    if not _page:
+        render_page(request.app)
+    headers = {'ETag': _page['etag'], 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if request.headers.get('If-None-Match') == _page['etag']:
+        return HTTPResponse(status=304, headers=headers)
+    headers['Link'] = PRELOAD_LINKS
+    if _accepts_gzip(request):
+        headers['Content-Encoding'] = 'gzip'
+        return raw(_page['gzip'], content_type='text/html; charset=utf-8', headers=headers)
+    return raw(_page['body'], content_type='text/html; charset=utf-8', headers=headers)
+
+
 blueprint.static('/', dir_path)
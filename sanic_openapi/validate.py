@@ -0,0 +1,106 @@
+import re
+from collections import defaultdict
+
+_TEMPLATE_PARAMETER = re.compile(r"{([^}/]+)}")
+
+
+class SpecValidationError(ValueError):
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("The spec has {} problems:\n{}".format(len(problems), "\n".join(problems)))
+
+
+class SpecIndex:
+    """
+    What `build_spec` generated, recorded path by path while it goes so the
+    validation needs no extra pass over the paths and a rebuilt path only
+    replaces its own entries.
+    """
+
+    def __init__(self):
+        # (handler, operationId, path parameters, security schemes) of each path by method
+        self.paths = {}
+
+    def set_path(self, path, methods, handler=None):
+        self.paths[path] = {
+            method: (
+                handler,
+                endpoint.get("operationId"),
+                {parameter["name"] for parameter in endpoint.get("parameters", ()) if parameter.get("in") == "path"},
+                {name for requirement in endpoint.get("security", ()) for name in requirement},
+            )
+            for method, endpoint in methods.items()
+        }
+
+    def clear(self):
+        self.paths.clear()
+
+    def operations(self):
+        """``(location, path, operationId, path parameters, security schemes)`` of every operation."""
+        seen = set()
+        for path, methods in self.paths.items():
+            for method, (handler, operation_id, parameters, schemes) in methods.items():
+                # the same handler can be routed through several paths, e.g. with a trailing slash
+                key = (path if handler is None else handler, method)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield "{} {}".format(method.upper(), path), path, operation_id, parameters, schemes
+
+
+def collect_refs(value, refs, location):
+    """Add the `$ref`s found in ``value`` to ``refs``, a mapping of sets of locations."""
+    if type(value) is dict:
+        ref = value.get("$ref")
+        if type(ref) is str:
+            refs[ref].add(location)
+        for item in value.values():
+            collect_refs(item, refs, location)
+    elif type(value) is list:
+        for item in value:
+            collect_refs(item, refs, location)
+
+
+def validate_spec(spec, index):
+    """
+    Check that every `$ref` and security scheme resolves, that the parameters
+    of path templates are declared and that operationIds are unique. Returns
+    the problems found.
+    """
+    problems = []
+
+    operation_ids = defaultdict(list)
+    security_definitions = spec.get("securityDefinitions", {}).keys()
+    for location, path, operation_id, declared, schemes in index.operations():
+        operation_ids[operation_id].append(location)
+        templated = set(_TEMPLATE_PARAMETER.findall(path))
+        for name in sorted(templated - declared):
+            problems.append("{} has no path parameter {}".format(location, name))
+        for name in sorted(declared - templated):
+            problems.append("{} declares path parameter {} missing in its path".format(location, name))
+        for name in sorted(schemes - security_definitions):
+            problems.append("{} security scheme {} does not exist".format(location, name))
+
+    for operation_id, locations in operation_ids.items():
+        if len(locations) > 1:
+            problems.append("operationId {} is used by {}".format(operation_id, ", ".join(locations)))
+
+    refs = defaultdict(set)
+    for section in ("definitions", "parameters", "responses"):
+        for name, entry in spec.get(section, {}).items():
+            collect_refs(entry, refs, "{} {}".format(section, name))
+    for path, methods in spec.get("paths", {}).items():
+        for method, endpoint in methods.items():
+            location = "{} {}".format(method.upper(), path)
+            collect_refs(endpoint, refs, location)
+            for status_code, response in endpoint.get("responses", {}).items():
+                if not response:
+                    problems.append("{} response {} has no description nor schema".format(location, status_code))
+
+    for ref, locations in refs.items():
+        _, _, target = ref.partition("#/")
+        section, _, name = target.partition("/")
+        if name not in spec.get(section, {}):
+            problems.append("{} referenced by {} does not exist".format(ref, ", ".join(sorted(locations))))
+
+    return problems
@@ -24,9 +24,11 @@ setup(
     author_email='channelcat@gmail.com',
     description='OpenAPI support for Sanic',
     packages=['sanic_openapi'],
-    package_data={'sanic_openapi': ['ui/*']},
+    package_data={'sanic_openapi': ['ui/*', 'ui/fonts/*']},
     platforms='any',
     install_requires=['pyyaml'],
+    extras_require={'msgpack': ['msgpack']},
+    entry_points={'console_scripts': ['sanic-openapi-diff=sanic_openapi.diff:main']},
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Environment :: Web Environment',
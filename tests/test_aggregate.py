@@ -0,0 +1,108 @@
+import json
+
+from sanic import Sanic
+from sanic_openapi.aggregate import SpecAggregator
+
+
+def service_spec(path, color_type='string'):
+    return {
+        'swagger': '2.0',
+        'paths': {path: {'get': {'responses': {'200': {'schema': {'$ref': '#/definitions/Car'}}}}}},
+        'definitions': {
+            'Car': {'type': 'object', 'properties': {'color': {'type': color_type}}},
+            'Status': {'type': 'object', 'properties': {'success': {'type': 'boolean'}}},
+        },
+    }
+
+
+def test_aggregate(tmp_path):
+    cars, trucks = tmp_path / 'cars.json', tmp_path / 'trucks.json'
+    cars.write_text(json.dumps(service_spec('/cars')))
+    trucks.write_text(json.dumps(service_spec('/trucks', color_type='integer')))
+
+    aggregator = SpecAggregator({'cars': str(cars), 'trucks': {'source': str(trucks), 'prefix': '/v1'}})
+    assert aggregator.refresh() == ['cars', 'trucks']
+    spec = json.loads(aggregator.encoded)
+    assert sorted(spec['definitions']) == ['Car', 'Status', 'trucks.Car']
+    assert spec['paths']['/cars']['get']['responses']['200']['schema'] == {'$ref': '#/definitions/Car'}
+    assert spec['paths']['/v1/trucks']['get']['responses']['200']['schema'] == {'$ref': '#/definitions/trucks.Car'}
+
+    # nothing changed, nothing is merged again
+    etag = aggregator.etag
+    assert aggregator.refresh() == []
+    assert aggregator.etag == etag
+
+    cars_path = aggregator.spec['paths']['/cars']
+    trucks.write_text(json.dumps(service_spec('/lorries')))
+    assert aggregator.refresh() == ['trucks']
+    assert aggregator.spec['paths']['/cars'] is cars_path
+    assert sorted(aggregator.spec['paths']) == ['/cars', '/v1/lorries']
+    assert sorted(aggregator.spec['definitions']) == ['Car', 'Status']
+    assert aggregator.etag != etag
+
+
+def test_aggregate_route(tmp_path):
+    cars = tmp_path / 'cars.json'
+    cars.write_text(json.dumps(service_spec('/cars')))
+
+    app = Sanic('test_aggregate_route')
+    SpecAggregator({'cars': str(cars)}).register(app, '/services.json')
+
+    request, response = app.test_client.get('/services.json')
+    assert response.status == 200
+    assert '/cars' in json.loads(response.body.decode())['paths']
+
+    request, response = app.test_client.get('/services.json', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status == 304
+
+
+def test_aggregate_nested_conflict(tmp_path):
+    def spec(path, color_type):
+        return {
+            'swagger': '2.0',
+            'paths': {path: {'get': {'responses': {'200': {'schema': {'$ref': '#/definitions/Garage'}}}}}},
+            'definitions': {
+                'Garage': {'type': 'object', 'properties': {'car': {'$ref': '#/definitions/Car'}}},
+                'Car': {'type': 'object', 'properties': {'color': {'type': color_type}}},
+            },
+        }
+
+    first, second = tmp_path / 'a.json', tmp_path / 'b.json'
+    first.write_text(json.dumps(spec('/a', 'string')))
+    second.write_text(json.dumps(spec('/b', 'integer')))
+
+    aggregator = SpecAggregator({'a': str(first), 'b': str(second)})
+    aggregator.refresh()
+    definitions = aggregator.spec['definitions']
+    assert sorted(definitions) == ['Car', 'Garage', 'b.Car', 'b.Garage']
+    assert aggregator.spec['paths']['/b']['get']['responses']['200']['schema'] == {'$ref': '#/definitions/b.Garage'}
+    assert definitions['b.Garage']['properties']['car'] == {'$ref': '#/definitions/b.Car'}
+    assert definitions['Garage']['properties']['car'] == {'$ref': '#/definitions/Car'}
+
+
+def test_aggregate_shared_security_schemes():
+    def spec(path, header='X-Token'):
+        return {
+            'paths': {path: {'get': {'security': [{'token': []}], 'responses': {'200': {'description': 'OK'}}}}},
+            'securityDefinitions': {'token': {'type': 'apiKey', 'name': header, 'in': 'header'}},
+            'tags': [{'name': 'vehicles'}],
+        }
+
+    aggregator = SpecAggregator({'a': 'a.json', 'b': 'b.json', 'c': 'c.json'})
+    aggregator.merge('a', spec('/a'))
+    aggregator.merge('b', spec('/b'))
+    aggregator.merge('c', spec('/c', header='X-Key'))
+    assert sorted(aggregator._security_definitions) == ['c.token', 'token']
+    assert aggregator._paths['/b']['get']['security'] == [{'token': []}]
+    assert aggregator._paths['/c']['get']['security'] == [{'c.token': []}]
+
+    # a is gone, b still uses its scheme and tag
+    aggregator.merge('a', {'paths': {}})
+    aggregator._encode()
+    assert aggregator.spec['securityDefinitions']['token']['name'] == 'X-Token'
+    assert aggregator.spec['tags'] == [{'name': 'vehicles'}]
+
+    aggregator.merge('b', {'paths': {}})
+    aggregator.merge('c', {'paths': {}})
+    assert aggregator._security_definitions == {}
+    assert aggregator._tags == {}
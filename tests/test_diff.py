@@ -0,0 +1,54 @@
+from copy import deepcopy
+
+from sanic_openapi.diff import diff_specs
+
+BASELINE = {
+    "swagger": "2.0",
+    "parameters": {
+        "header_AUTHORIZATION": {"type": "string", "required": False, "in": "header", "name": "AUTHORIZATION"}
+    },
+    "paths": {
+        "/cars": {
+            "get": {
+                "operationId": "car_list",
+                "parameters": [{"$ref": "#/parameters/header_AUTHORIZATION"}],
+                "responses": {"200": {"schema": {"$ref": "#/definitions/Car"}}},
+            },
+            "post": {"operationId": "car_add", "parameters": [], "responses": {}},
+        },
+        "/garage": {"get": {"operationId": "garage", "summary": "Garage", "responses": {}}},
+    },
+    "definitions": {
+        "Car": {"type": "object", "properties": {"doors": {"type": "integer"}, "color": {"type": "string"}}},
+        "Status": {"type": "object", "properties": {"success": {"type": "boolean"}}},
+    },
+}
+
+
+def changes(spec):
+    return {(change.kind, change.subject, change.location, change.detail): change.breaking for change in spec}
+
+
+def test_identical_specs():
+    assert not diff_specs(BASELINE, deepcopy(BASELINE))
+
+
+def test_breaking_changes():
+    new = deepcopy(BASELINE)
+    new["parameters"]["header_AUTHORIZATION"]["required"] = True
+    del new["paths"]["/cars"]["post"]
+    new["paths"]["/garage"]["get"]["summary"] = "The garage"
+    new["paths"]["/trucks"] = {"get": {"operationId": "truck_list"}}
+    del new["definitions"]["Car"]["properties"]["color"]
+    new["definitions"]["Car"]["properties"]["doors"]["description"] = "Number of doors"
+    del new["definitions"]["Status"]
+
+    assert changes(diff_specs(BASELINE, new)) == {
+        ("changed", "parameter", "GET /cars", "header AUTHORIZATION"): True,
+        ("removed", "operation", "POST /cars", None): True,
+        ("changed", "summary", "GET /garage", None): False,
+        ("added", "operation", "GET /trucks", None): False,
+        ("removed", "property", "Car", "color"): True,
+        ("changed", "property", "Car", "doors"): False,
+        ("removed", "definition", "Status", None): True,
+    }
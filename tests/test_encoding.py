@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+import pytest
+from sanic_openapi.encoding import get_json_encoder, iter_encode, strip_docs
+
+SPEC = {
+    "swagger": "2.0",
+    "paths": {
+        "/b": {"get": {"operationId": "b", "description": "Gets b", "responses": {"200": {}}}},
+        "/a": {"put": {"operationId": "a", "parameters": [{"name": "description", "in": "query"}]}},
+    },
+    "definitions": {
+        "Car": {
+            "type": "object",
+            "properties": {
+                "description": {"type": "string", "example": "é"},
+                "weight": {"type": "number", "minimum": 1e-07, "maximum": 12345678.9},
+            },
+        }
+    },
+    "info": {"version": "1.0.0", "released": date(2020, 1, 1), "built": datetime(2020, 1, 1, 10, 0)},
+}
+
+
+def test_streaming_matches_encoder():
+    encoded = get_json_encoder("json")(SPEC)
+    assert "".join(iter_encode(SPEC, chunk_size=8)).encode("utf-8") == encoded
+
+
+@pytest.mark.parametrize("name", ["orjson", "ujson"])
+def test_encoders_are_deterministic(name):
+    pytest.importorskip(name)
+    assert get_json_encoder(name)(SPEC) == get_json_encoder("json")(SPEC)
+    spec = {**SPEC, "definitions": {"Car": {"type": "number", "maximum": 0.5}}}
+    assert get_json_encoder(name)(spec) == get_json_encoder("json")(spec)
+    spec = {**SPEC, "x-codes": {200: "OK", 404: "Not found"}}
+    assert get_json_encoder(name)(spec) == get_json_encoder("json")(spec)
+
+
+def test_datetimes_are_iso_formatted():
+    assert b'"built":"2020-01-01T10:00:00"' in get_json_encoder("json")(SPEC)
+
+
+def test_strip_docs_keeps_names():
+    stripped = strip_docs(SPEC)
+    assert "description" not in stripped["paths"]["/b"]["get"]
+    assert stripped["paths"]["/a"]["put"]["parameters"][0]["name"] == "description"
+    assert stripped["definitions"]["Car"]["properties"]["description"] == {"type": "string"}
@@ -0,0 +1,55 @@
+from array import array
+from json import loads as json_loads
+
+from sanic import Sanic
+from sanic.exceptions import ServerError
+from sanic.response import text
+from sanic_openapi import doc, openapi_blueprint
+from sanic_openapi.metrics import OperationMetrics
+
+
+def test_operation_metrics():
+    metrics = OperationMetrics(buckets=(0.1, 1.0))
+    metrics.set_operations([(('app.get_car', 'GET'), 'get_car', 'get', '/car', ['cars'])])
+    metrics.counts[0] = 4
+    metrics.histogram[0:3] = array('Q', [3, 0, 1])
+
+    stats = metrics.snapshot()['GET /car']
+    assert stats['operationId'] == 'get_car'
+    assert stats['p50'] == 0.1
+    assert stats['p99'] is None
+    assert stats['buckets'] == {'0.1': 3, '1.0': 0, '+Inf': 1}
+
+    # counts survive a rebuild of the operations
+    metrics.set_operations(
+        [(('app.other', 'GET'), 'other', 'get', '/other', []), (('app.get_car', 'GET'), 'get_car', 'get', '/car', [])]
+    )
+    assert metrics.stats(metrics.slot(('app.get_car', 'GET')))['count'] == 4
+
+
+def test_metrics_endpoint():
+    app = Sanic('test_metrics_endpoint')
+    app.blueprint(openapi_blueprint)
+    app.config.API_METRICS = True
+
+    @app.get('/cars')
+    @doc.operation('list_cars')
+    def cars(request):
+        return text('')
+
+    @app.get('/fail')
+    def fail(request):
+        raise ServerError('failed')
+
+    app.test_client.get('/cars')
+    app.test_client.get('/fail')
+    request, response = app.test_client.get('/openapi/_metrics')
+    snapshot = json_loads(response.body.decode())
+    assert snapshot['GET /cars']['count'] == 1
+    assert snapshot['GET /cars']['operationId'] == 'list_cars'
+    assert snapshot['GET /fail']['server_errors'] == 1
+    assert snapshot['GET /fail']['error_rate'] == 1.0
+
+    request, response = app.test_client.get('/openapi/_metrics/spec.json')
+    spec = json_loads(response.body.decode())
+    assert spec['paths']['/cars']['get']['x-metrics']['count'] == 1
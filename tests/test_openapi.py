@@ -1,5 +1,15 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from json import loads as json_loads
+
+import pytest
+import yaml
 from sanic import Sanic
-from sanic_openapi import openapi_blueprint
+from sanic.response import text
+from sanic.views import HTTPMethodView
+from sanic_openapi import doc, openapi, openapi_blueprint, swagger, swagger_blueprint
+from sanic_openapi.validate import SpecValidationError
 
 # ------------------------------------------------------------ #
 #  GET
@@ -11,3 +21,357 @@ def test_get_docs():
     
     request, response = app.test_client.get('/openapi/spec.json')
     assert response.status == 200
+
+
+def test_get_docs_streaming():
+    app = Sanic('test_get_streaming')
+    app.blueprint(openapi_blueprint)
+    app.config.API_SPEC_STREAMING = True
+
+    @app.get('/test/<item_id:int>')
+    def test(request, item_id):
+        return text('')
+
+    request, response = app.test_client.get('/openapi/spec.json')
+    assert response.status == 200
+    spec = json_loads(response.body.decode())
+    assert spec['paths']['/test/{item_id}']['get']['parameters'][0]['name'] == 'item_id'
+
+
+def test_get_docs_alternative_formats():
+    app = Sanic('test_get_formats')
+    app.blueprint(openapi_blueprint)
+    app.config.API_SPEC_FORMATS = ['yaml', 'min']
+
+    @app.get('/test')
+    @doc.description('A description')
+    def test(request):
+        return text('')
+
+    request, response = app.test_client.get('/openapi/spec.yaml')
+    assert response.status == 200
+    assert yaml.safe_load(response.body)['paths']['/test']['get']['description'] == 'A description'
+
+    request, response = app.test_client.get('/openapi/spec.min.json')
+    assert 'description' not in json_loads(response.body.decode())['paths']['/test']['get']
+
+    request, response = app.test_client.get('/openapi/spec', headers={'Accept': 'application/x-yaml'})
+    assert response.headers['Content-Type'] == 'application/x-yaml'
+
+    request, response = app.test_client.get('/openapi/spec.msgpack')
+    assert response.status == 404
+
+
+def test_get_docs_etag():
+    app = Sanic('test_get_etag')
+    app.blueprint(openapi_blueprint)
+
+    request, response = app.test_client.get('/openapi/spec.json')
+    etag = response.headers['ETag']
+
+    request, response = app.test_client.get('/openapi/spec.json', headers={'If-None-Match': etag})
+    assert response.status == 304
+
+
+def test_swagger_page():
+    app = Sanic('test_swagger_page')
+    app.blueprint(openapi_blueprint)
+    app.blueprint(swagger_blueprint)
+
+    @app.get('/test')
+    @doc.summary('Ends a </script> element')
+    def test(request):
+        return text('')
+
+    request, response = app.test_client.get('/swagger', headers={'Accept-Encoding': 'gzip'})
+    assert response.status == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'rel=preload' in response.headers['Link']
+    assert b'Ends a <\\/script> element' in response.body
+    assert b'fonts.googleapis.com' not in response.body
+
+    request, response = app.test_client.get('/swagger', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status == 304
+
+
+def test_swagger_page_options():
+    app = Sanic('test_swagger_page_options')
+    app.blueprint(openapi_blueprint)
+    app.blueprint(swagger_blueprint)
+    app.config.API_UI_INLINE_SPEC = False
+
+    request, response = app.test_client.get('/swagger')
+    assert b'href="./swagger/fonts.css"' in response.body
+    assert b'var eventsUrl = /*events*/null' in response.body
+    request, response = app.test_client.get('/swagger/fonts/open-sans-400.woff2')
+    assert response.status == 200
+
+    app = Sanic('test_swagger_page_events')
+    app.blueprint(openapi_blueprint, url_prefix='/docs')
+    app.config.API_SPEC_RELOAD = True
+    app.debug = True
+    swagger.render_page(app)
+    assert b'var eventsUrl = "/docs/_events"' in swagger._page['body']
+
+    app = Sanic('test_swagger_page_unknown_spec')
+    app.blueprint(openapi_blueprint)
+    app.blueprint(swagger_blueprint)
+    app.config.API_UI_INLINE_SPEC = 'missing'
+
+    with pytest.raises(ValueError, match='missing'):
+        app.test_client.get('/swagger')
+
+
+def test_async_build():
+    app = Sanic('test_async_build')
+    app.blueprint(openapi_blueprint)
+    app.config.API_ASYNC_BUILD = True
+    app.config.API_BUILD_CHUNK_SIZE = 1
+
+    for index in range(3):
+        app.add_route(lambda request: text(''), '/test{}'.format(index), name='test{}'.format(index))
+
+    # holds the build until the spec was requested
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+
+    def blocking_listener(app):
+        started.set()
+        try:
+            release.wait(10)
+        finally:
+            finished.set()
+
+    openapi.build_listeners.append(blocking_listener)
+    try:
+        request, response = app.test_client.get('/openapi/spec.json')
+    finally:
+        release.set()
+        if started.is_set():
+            finished.wait(10)
+        openapi.build_listeners.remove(blocking_listener)
+    assert response.status == 503
+    assert response.headers['Retry-After'] == '1'
+    assert openapi._build_stats['state'] == 'cancelled'
+
+    request, response = app.test_client.get('/openapi/_stats')
+    assert 'routes_done' in json_loads(response.body.decode())['build']
+
+    asyncio.run(openapi.build_spec_async(app))
+    assert {'/test0', '/test1', '/test2'} <= set(openapi._spec['paths'])
+    stats = openapi._build_stats
+    assert stats['state'] == 'done'
+    assert stats['routes'] == stats['routes_done'] == stats['chunks'] > 0
+
+
+def test_shared_parameters():
+    app = Sanic('test_shared_parameters')
+    app.blueprint(openapi_blueprint)
+
+    @app.get('/first')
+    @doc.consumes({'AUTHORIZATION': str}, location='header')
+    @doc.response(404, description='Not found')
+    def first(request):
+        return text('')
+
+    @app.get('/second')
+    @doc.consumes({'AUTHORIZATION': str}, location='header')
+    @doc.response(404, description='Not found')
+    def second(request):
+        return text('')
+
+    request, response = app.test_client.get('/openapi/spec.json')
+    spec = json_loads(response.body.decode())
+    assert spec['parameters']['header_AUTHORIZATION']['in'] == 'header'
+    for uri in ('/first', '/second'):
+        assert spec['paths'][uri]['get']['parameters'] == [{'$ref': '#/parameters/header_AUTHORIZATION'}]
+    ref = spec['paths']['/first']['get']['responses']['404']['$ref']
+    assert spec['responses'][ref.rsplit('/', 1)[-1]] == {'description': 'Not found'}
+
+
+def test_http_method_view():
+    app = Sanic('test_http_method_view')
+    app.blueprint(openapi_blueprint)
+    app.config.API_SHARED_DEFINITIONS = False
+
+    @doc.consumes({'AUTHORIZATION': str}, location='header')
+    @doc.tag('items')
+    class ItemView(HTTPMethodView):
+        @doc.summary('Fetches an item')
+        def get(self, request, item_id):
+            return text('')
+
+        @doc.summary('Updates an item')
+        @doc.consumes(doc.String(name='name'), location='query')
+        def put(self, request, item_id):
+            return text('')
+
+    app.add_route(ItemView.as_view(), '/items/<item_id:int>')
+
+    request, response = app.test_client.get('/openapi/spec.json')
+    spec = json_loads(response.body.decode())
+    methods = spec['paths']['/items/{item_id}']
+    assert methods['get']['summary'] == 'Fetches an item'
+    assert methods['put']['summary'] == 'Updates an item'
+    assert methods['get']['tags'] == ['items']
+    assert [p['name'] for p in methods['get']['parameters']] == ['item_id', 'AUTHORIZATION']
+    assert [p['name'] for p in methods['put']['parameters']] == ['item_id', 'AUTHORIZATION', 'name']
+    assert methods['get']['operationId'] != methods['put']['operationId']
+
+
+def test_named_specs():
+    app = Sanic('test_named_specs')
+    app.blueprint(openapi_blueprint)
+    app.config.API_SPECS = {
+        'v1': {'version': 1, 'basePath': '/v1', 'info': {'version': '1.0'}},
+        'v2': {'prefix': '/v2'},
+    }
+
+    @dataclass
+    class Wagon:
+        """
+        type: object
+        properties:
+          name:
+            type: string
+        """
+
+        name: str
+
+    @app.get('/v1/wagons')
+    @doc.consumes(Wagon, location='body')
+    def wagons_v1(request):
+        return text('')
+
+    @app.get('/v2/wagons')
+    @doc.consumes(Wagon, location='body')
+    def wagons_v2(request):
+        return text('')
+
+    @app.get('/v2/status')
+    def status(request):
+        return text('')
+
+    request, response = app.test_client.get('/openapi/spec.json')
+    spec = json_loads(response.body.decode())
+    assert {'/v1/wagons', '/v2/wagons', '/v2/status'} <= set(spec['paths'])
+
+    request, response = app.test_client.get('/openapi/v1/spec.json')
+    v1 = json_loads(response.body.decode())
+    assert v1['basePath'] == '/v1'
+    assert v1['info']['version'] == '1.0'
+    assert {path.rstrip('/') for path in v1['paths']} == {'/wagons'}
+    assert list(v1['definitions']) == ['Wagon']
+
+    request, response = app.test_client.get('/openapi/v2/spec.json')
+    v2 = json_loads(response.body.decode())
+    assert {path.rstrip('/') for path in v2['paths']} == {'/v2/wagons', '/v2/status'}
+    assert v2['definitions']['Wagon'] == spec['definitions']['Wagon']
+    assert openapi._named_specs['v2'][0]['definitions']['Wagon'] is openapi._spec['definitions']['Wagon']
+
+    request, response = app.test_client.get('/openapi/v3/spec.json')
+    assert response.status == 404
+
+
+def test_security_definitions():
+    app = Sanic('test_security_definitions')
+    app.blueprint(openapi_blueprint)
+    app.config.API_SECURITY_CHECK = True
+    token = doc.ApiKey('token', 'X-Token')
+
+    @app.get('/secured')
+    @doc.security(token, {'basic': []})
+    def secured(request):
+        return text('')
+
+    @app.get('/public')
+    def public(request):
+        return text('')
+
+    app.config.API_SECURITY_DEFINITIONS = {'basic': {'type': 'basic'}}
+    request, response = app.test_client.get('/openapi/spec.json')
+    spec = json_loads(response.body.decode())
+    assert spec['securityDefinitions']['token'] == {'type': 'apiKey', 'name': 'X-Token', 'in': 'header'}
+    assert spec['paths']['/secured']['get']['security'] == [{'token': []}, {'basic': []}]
+
+    request, response = app.test_client.get('/secured')
+    assert response.status == 401
+    request, response = app.test_client.get('/secured', headers={'X-Token': 'secret'})
+    assert response.status == 200
+    request, response = app.test_client.get('/secured', headers={'Authorization': 'Basic dXNlcjpwYXNz'})
+    assert response.status == 200
+    request, response = app.test_client.get('/public')
+    assert response.status == 200
+
+
+def test_validate_spec():
+    app = Sanic('test_validate_spec')
+    app.blueprint(openapi_blueprint)
+    app.config.API_VALIDATE_SPEC = 'raise'
+
+    @dataclass
+    class Garage:
+        """
+        ---
+        properties:
+            car:
+                type: Object
+                ref: Car
+        """
+
+        car: dict
+
+    @app.get('/first/<item_id>')
+    @doc.consumes(doc.String(name='other_id'), location='path')
+    @doc.response(200, examples=Garage)
+    @doc.response(404, description='Not found')
+    def first(request, item_id):
+        return text('')
+
+    @app.get('/second')
+    @doc.operation('first')
+    @doc.security('missing')
+    def second(request):
+        return text('')
+
+    with pytest.raises(SpecValidationError) as error:
+        app.test_client.get('/openapi/spec.json')
+
+    assert sorted(error.value.problems) == [
+        '#/definitions/Car referenced by definitions Garage does not exist',
+        'GET /first/{item_id} declares path parameter other_id missing in its path',
+        'GET /second security scheme missing does not exist',
+        'operationId first is used by GET /first/{item_id}, GET /second',
+    ]
+
+
+def test_reload_spec(tmp_path, monkeypatch):
+    source = '''
+from sanic.response import text
+from sanic_openapi import doc
+
+
+class Reloaded:
+    name = str
+
+
+@doc.summary({summary!r})
+@doc.consumes(Reloaded, location='body')
+def handler(request):
+    return text('')
+'''
+    module_path = tmp_path / 'reloaded_routes.py'
+    module_path.write_text(source.format(summary='Before'))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import reloaded_routes
+
+    app = Sanic('test_reload_spec')
+    app.blueprint(openapi_blueprint)
+    app.add_route(reloaded_routes.handler, '/reloaded', methods=['POST'])
+    app.test_client.get('/openapi/spec.json')
+
+    module_path.write_text(source.format(summary='After').replace('name = str', 'name = int'))
+    openapi.reload_spec(app, ['reloaded_routes'])
+
+    assert openapi._spec['paths']['/reloaded']['post']['summary'] == 'After'
+    assert openapi._spec['definitions']['Reloaded']['properties']['name']['type'] == 'integer'
+    assert set(openapi._index.paths) == set(openapi._paths)
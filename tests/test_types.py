@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from json import loads as json_loads
 from sanic import Sanic
 from sanic.response import json
@@ -26,3 +27,146 @@ def test_list_default():
     assert response.status == 200
     assert parameter['type'] == 'array'
     assert parameter['items']['type'] == 'integer'
+
+
+def test_object_registered_on_build():
+    app = Sanic('test_object_registered')
+
+    app.blueprint(openapi_blueprint)
+
+    class Engine:
+        """
+        An engine
+        ---
+        properties:
+            power:
+                type: integer
+        """
+
+    class Car:
+        doors = int
+        engine = Engine
+
+    @app.put('/car')
+    @doc.consumes(doc.Object(Car), location="body")
+    def test(request):
+        return json({"test": True})
+
+    assert Car not in doc.definitions
+
+    request, response = app.test_client.get('/openapi/spec.json')
+
+    response_schema = json_loads(response.body.decode())
+    definitions = response_schema['definitions']
+
+    assert definitions['Car']['properties']['engine']['$ref'] == '#/definitions/Engine'
+    assert definitions['Engine']['properties'] == {'power': {'type': 'integer'}}
+
+
+@dataclass
+class Wheel:
+    """
+    A wheel
+    ---
+    properties:
+        size:
+            type: integer
+    """
+
+    size: int
+
+
+@dataclass
+class Truck:
+    """
+    A truck
+    ---
+    required:
+    - wheel
+    properties:
+        wheel:
+            type: Object
+            ref: Wheel
+    """
+
+    wheel: Wheel
+
+
+def test_parallel_expansion():
+    app = Sanic('test_parallel_expansion')
+    app.config.API_EXPANSION_POOL = 'thread'
+
+    app.blueprint(openapi_blueprint)
+
+    @app.put('/truck')
+    @doc.consumes(Truck, location="body")
+    def test(request):
+        return json({"test": True})
+
+    request, response = app.test_client.get('/openapi/spec.json')
+
+    definitions = json_loads(response.body.decode())['definitions']
+
+    assert definitions['Truck']['properties']['wheel'] == {'type': 'Object', '$ref': '#/definitions/Wheel'}
+    assert definitions['Wheel']['properties'] == {'size': {'type': 'integer'}}
+
+
+def test_parallel_expansion_object_name():
+    app = Sanic('test_parallel_expansion_object_name')
+    app.config.API_EXPANSION_POOL = 'thread'
+    app.config.API_VALIDATE_SPEC = 'raise'
+
+    app.blueprint(openapi_blueprint)
+
+    @dataclass
+    class Lorry:
+        """
+        A lorry
+        ---
+        properties:
+            wheel:
+                type: Object
+                ref: Wheel
+        """
+
+        wheel: Wheel
+
+    @app.put('/lorry')
+    @doc.consumes(doc.Object(Lorry, object_name='Vehicle'), location="body")
+    def test(request):
+        return json({"test": True})
+
+    request, response = app.test_client.get('/openapi/spec.json')
+
+    spec = json_loads(response.body.decode())
+
+    assert spec['paths']['/lorry']['put']['parameters'][0]['schema'] == {'$ref': '#/definitions/Vehicle'}
+    assert 'Vehicle' in spec['definitions']
+    assert 'Lorry' not in spec['definitions']
+
+
+def test_definition_registry():
+    import gc
+
+    registry = doc.DefinitionRegistry()
+
+    class First:
+        pass
+
+    class Second:
+        pass
+
+    registry[First] = ('First', {'type': 'object', 'properties': {'name': {'type': 'string'}}})
+    registry[Second] = ('Second', {'type': 'object', 'properties': {'name': {'type': 'string'}}})
+    registry['Third'] = ('Third', {'type': 'object'})
+    assert registry[First][1] is registry[Second][1]
+    assert registry.stats()['schemas'] == 2
+
+    # a class replaces the entry from a pydantic schema with the same name
+    registry['First'] = ('First', {'type': 'object', 'title': 'First'})
+    assert 'First' not in registry
+
+    del First, Second
+    gc.collect()
+    assert list(registry) == ['Third']
+    assert registry.stats() == {'entries': 1, 'classes': 0, 'names': 1, 'schemas': 1, 'schema_bytes': 17}